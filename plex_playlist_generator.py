@@ -1,7 +1,15 @@
 #!/usr/bin/python3.8
 
 import argparse
+import asyncio
+import contextvars
+import email.utils
+import functools
+import io
+import json
 import random
+import sys
+import threading
 
 import certifi
 import requests
@@ -17,18 +25,57 @@ from plexapi.playlist import Playlist
 from plexapi.exceptions import NotFound
 from plexapi.exceptions import Unauthorized
 from plexapi.exceptions import BadRequest
+from plexapi import utils as plex_utils
 
 import tvdb_api
 import re
 import logging
+import os
+import sqlite3
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
 
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-args = None
+class RunOptions:
+    """The options of the run (args), either the parsed command line or the options of the current --jobs job
+
+    A home user worker switches to its own copy of the options (begin_copy) so nothing one user changes leaks into the
+    users generated next to it. The copy is kept in a context variable, so the --async calls of the worker see it too.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, '_options', None)
+        object.__setattr__(self, '_copy', contextvars.ContextVar('options_copy', default=None))
+
+    def use_options(self, options):
+        object.__setattr__(self, '_options', options)
+
+    def begin_copy(self):
+        """Switches the current thread (and the calls it starts) to a copy of the options, returns the token for end_copy"""
+        return self._copy.set(argparse.Namespace(**vars(self._options)))
+
+    def end_copy(self, token):
+        self._copy.reset(token)
+
+    def current_options(self):
+        options = self._copy.get()
+        return self._options if options is None else options
+
+    def __getattr__(self, name):
+        return getattr(self.current_options(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.current_options(), name, value)
+
+
+args = RunOptions()
 
 #string seperators
 colon = ':'
@@ -39,6 +86,35 @@ BLACKLIST = ['Downton Abbey',
              'Poldark (2015)'
              ]
 
+#Number of items requested per page when bulk fetching all episodes of a library section (--bulk-fetch)
+BULK_CONTAINER_SIZE = 1000
+
+#Number of episodes first requested for a show drawn with --lazy-fetch, doubled each time the show is drawn again
+LAZY_CONTAINER_SIZE = 4
+
+#Share of extra random movies requested from each movie section, to make up for blacklisted movies
+MOVIE_SAMPLE_OVERDRAW = 0.5
+
+#Longest item uri sent in one playlist request (before url encoding), longer playlists are filled with several requests
+PLAYLIST_URI_MAX_LENGTH = 4000
+
+#Status codes a server uses to push back on too many requests, how often such a request is retried and the methods that are
+#safe to send again (a POST may have created a playlist before the server pushed back)
+RATE_LIMIT_STATUS_CODES = (429, 503)
+RATE_LIMIT_RETRIES = 5
+RATE_LIMIT_RETRY_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+#Request rate a host without --max-request-rate is slowed down to when it first pushes back, and the rate at which it is
+#no longer limited again
+RATE_LIMIT_BACKOFF_RATE = 5
+RATE_LIMIT_UNCAPPED_RATE = 20
+#Lowest request rate (requests per second) a host is slowed down to, and how much the rate recovers per successful request
+RATE_LIMIT_MIN_RATE = 0.5
+RATE_LIMIT_RECOVERY = 0.5
+#Server errors and connection failures the shared HTTP session retries (429/503 are handled by the rate limiter)
+HTTP_RETRY_STATUS_CODES = (500, 502, 504)
+#Seconds a GET response is reused for identical requests, any other request (create, update, delete) forgets them all
+REQUEST_MEMO_SECONDS = 5
+
 
 ##################################################################################################################################################
 ###                                                       Before running this script                                                           ###
@@ -79,167 +155,728 @@ BLACKLIST = ['Downton Abbey',
 #                  - [Enhancements] Added a check to make sure a user entered either a --adminuser argument or a --homeusers argument.           #
 #                  - [Enhancements] Added the ability to purge a playlist without providing the --select-library, --allshows,                    #
 #                    or --allmovies arguments.                                                                                                   #
+#                                                                                                                                                #
+#       10/17/2026 - [Improvements] Added --bulk-fetch to load the episodes of a TV Show section with one paginated search instead of one        #
+#                    request per show.                                                                                                           #
+#                  - [Improvements] Added --lazy-fetch to only fetch the episodes of shows that are actually drawn for the playlist.             #
+#                  - [Improvements] Library sections are fetched once per connection and classified by their section type.                       #
+#                  - [Added Feature] Added --workers to generate the playlists of several home users at the same time. A failing user no longer  #
+#                    stops the playlists of the remaining users from being generated.                                                            #
+#                  - [Improvements] Replaced the fixed sleeps between users and purges with a shared rate limiter that only slows down           #
+#                    when plex.tv or the Plex server answers with 429/503 (honouring Retry-After). Added --max-request-rate.                     #
+#                  - [Improvements] Added --shared-snapshot to fetch the library once per run and only fetch the watch state of each user.       #
+#                  - [Added Feature] Added a persistent SQLite metadata cache (--cache-dir, --cache-max-age, --refresh-cache) that is refreshed  #
+#                    incrementally with the items updated since the last sync.                                                                   #
+#                  - [Improvements] TVDB lookups share one client and cache the season lengths (on disk with --cache-dir, --tvdb-cache-ttl).     #
+#                  - [Improvements] Missing episodes are detected against the episodes already fetched instead of probing Plex for each one.     #
+#                    Added --check-skipped to turn the missing episode check on.                                                                 #
+#                  - [Improvements] All requests share one pooled keep-alive HTTP session with gzip and retries (--http-retries), and the        #
+#                    plex.tv user and shared server listings are only fetched once per run.                                                      #
+#                  - [Added Feature] Added --async to send the section listings and episode fetches concurrently.                                #
+#                  - [Added Feature] Added --incremental to update an existing playlist in place (remove, add and move only what changed).       #
+#                  - [Improvements] Movies are drawn without replacement and the blacklist is checked once per drawn movie, so large movie       #
+#                    libraries no longer retry duplicates. Fewer eligible movies than requested ends the selection instead of looping.           #
+#                  - [Improvements] Shows that ran out of episodes are removed from the selection pool instead of being drawn again, so the      #
+#                    selection no longer loops once most shows are drained.                                                                      #
+#                  - [Improvements] Episodes are read with a per-show cursor (lazily shuffled with --randomize) instead of reshuffling and       #
+#                    popping the episode list of a show for every pick. Specials are skipped with one bisect.                                    #
+#                  - [Improvements] The number of candidate shows is read with a count only query (container size 0) instead of downloading      #
+#                    every section a second time to size the playlist.                                                                           #
+#                  - [Improvements] Random movies are drawn by the server (random sort, limited to about the requested number per section        #
+#                    weighted by the section sizes) instead of downloading every movie of the selected sections.                                 #
+#                  - [Improvements] --bulk-fetch, --shared-snapshot and the movie fallback stream their sections a page at a time as light       #
+#                    records instead of building every plex object at once.                                                                      #
+#                  - [Improvements] Candidate episodes and movies are kept as compact records (__slots__) and only the selected items are        #
+#                    turned into plex objects.                                                                                                   #
+#                  - [Improvements] Playlists are created and filled from the ratingKeys of the selected items, in chunks for long playlists,    #
+#                    so the selected items no longer have to be fetched as plex objects first.                                                   #
+#                  - [Improvements] The plex.tv account and its users are fetched once per run, home users connect through the address the       #
+#                    admin connection already uses, and their server tokens are cached (on disk with --cache-dir, --home-token-ttl).             #
+#                  - [Added Feature] Added --token-map to connect every home user with their server token from one bulk plex.tv listing.         #
+#                  - [Improvements] Identical GET requests in flight at the same time share one response, which is reused for a few seconds      #
+#                    until the next create, update or delete request.                                                                            #
+#                  - [Improvements] The playlists of each user are listed once and looked up by title, instead of listing every playlist for     #
+#                    each existence check and delete.                                                                                            #
+#                  - [Added Feature] Added --jobs to generate many playlists from a JSON (or YAML) jobs file in one run, sharing the login,      #
+#                    the connections and the library snapshot between the jobs.                                                                  #
 ##################################################################################################################################################
 
 
 
-def get_args():
+def get_parser():
     parser = argparse.ArgumentParser(description='Create playlist of unwatched episodes from random shows '
                                                  'but in correct episode order.')
-    parser.add_argument('--name', help='Playlist Name', default='[Auto-Generated]')
-    parser.add_argument('--number', '-n', help='Number of episodes or Movies to add to play list', type=int, default=10)
-    parser.add_argument('--debug', '-d', help='Debug Logging', action="store_true")
+    #Option string -> action of every option, used to parse the options of a --jobs job like a command line
+    parser.option_actions = dict()
+
+    def add_option(group, *option_strings, **kwargs):
+        action = group.add_argument(*option_strings, **kwargs)
+        for option_string in option_strings:
+            parser.option_actions[option_string] = action
+        return action
+
+    add_option(parser, '--name', help='Playlist Name', default='[Auto-Generated]')
+    add_option(parser, '--number', '-n', help='Number of episodes or Movies to add to play list', type=int, default=10)
+    add_option(parser, '--debug', '-d', help='Debug Logging', action="store_true")
+    add_option(parser, '--jobs', help='JSON (or YAML) file with a list of playlists to generate in one run, each with its own options (I.E. "name", "select-library", "number", "homeusers")')
     group_server = parser.add_argument_group('Server Connection Method')
-    group_server.add_argument('--server', action='store_true', help='Server connection Method')
-    group_server.add_argument('--baseurl', '-b', help='Base URL of Server (I.E \"http://10.1.1.8:32400\" or \"https://your.domain.com:32400\")', type=str, default="http://localhost:32400")
-    group_server.add_argument('--token', '-t', help='Authentication Token')
+    add_option(group_server, '--server', action='store_true', help='Server connection Method')
+    add_option(group_server, '--baseurl', '-b', help='Base URL of Server (I.E \"http://10.1.1.8:32400\" or \"https://your.domain.com:32400\")', type=str, default="http://localhost:32400")
+    add_option(group_server, '--token', '-t', help='Authentication Token')
     group_account = parser.add_argument_group('Plex Account Connection Method')
-    group_account.add_argument('--account', action='store_true', help='Account Connection Method')
-    group_account.add_argument('--username', '-u', help='Plex Account Username')
-    group_account.add_argument('--password', '-p', help='Plex Account Password')
-    group_account.add_argument('--resource', '-r', help='Resource Name (Plex Server Name)')
-    group_account.add_argument('--tvdb-api-key', help='TVDB API Key)')
+    add_option(group_account, '--account', action='store_true', help='Account Connection Method')
+    add_option(group_account, '--username', '-u', help='Plex Account Username')
+    add_option(group_account, '--password', '-p', help='Plex Account Password')
+    add_option(group_account, '--resource', '-r', help='Resource Name (Plex Server Name)')
+    add_option(group_account, '--tvdb-api-key', help='TVDB API Key)')
+    add_option(group_account, '--tvdb-cache-ttl', help='Seconds the episode count of a TVDB season is cached for', type=int, default=604800)
     group_behavior = parser.add_argument_group('Episode/Movie Selection Behavior')
-    group_behavior.add_argument('--ignore-skipped', action='store_true', help="Don't test for missing episodes", default=True)
-    group_behavior.add_argument('--randomize', action='store_true', help='Randomize selected episodes, not next unwatched')
-    group_behavior.add_argument('--include-watched', action='store_true', help='include watched movies or episodes (use with --randomize)')  
+    add_option(group_behavior, '--ignore-skipped', action='store_true', help="Don't test for missing episodes", default=True)
+    add_option(group_behavior, '--check-skipped', dest='ignore_skipped', action='store_false', help="Skip shows whose next episode follows a missing episode")
+    add_option(group_behavior, '--randomize', action='store_true', help='Randomize selected episodes, not next unwatched')
+    add_option(group_behavior, '--include-watched', action='store_true', help='include watched movies or episodes (use with --randomize)')  
+    add_option(group_behavior, '--shared-snapshot', action='store_true', help='Fetch the library once with the admin connection and only fetch the watch state (and visible items of restricted users) of each user')
+    add_option(group_behavior, '--cache-dir', help='Directory of the persistent library metadata cache (enables the cache)', type=str)
+    add_option(group_behavior, '--cache-max-age', help='Seconds after which a cached library section is fully resynced instead of incrementally', type=int, default=86400)
+    add_option(group_behavior, '--refresh-cache', action='store_true', help='Fully resync the cached library sections')
+    add_option(group_behavior, '--async', dest='async_engine', action='store_true', help='Send the section listings and episode fetches concurrently')
+    add_option(group_behavior, '--async-concurrency', help='Maximum number of concurrent requests with --async', type=int, default=8)
+    add_option(group_behavior, '--lazy-fetch', action='store_true', help='Only fetch the next few episodes of a show once it is drawn for the playlist')
+    add_option(group_behavior, '--bulk-fetch', action='store_true', help='Fetch all episodes of a TV Show section with one paginated search instead of one request per show')
     group_libraries = parser.add_argument_group('Library Selection Behavior')    
-    group_libraries.add_argument('--allshows', help='Grab All Shows in all Library sections From Plex', action='store_true', default=False)
-    group_libraries.add_argument('--allmovies', help='Grab All Movies in all Library sections From Plex', action='store_true', default=False)
-    group_libraries.add_argument('--select-library', '-l', help='Choose between library sections of both TV Shows or Movies to build a playlist from (comma seperated within quotes if multiple users)')
+    add_option(group_libraries, '--allshows', help='Grab All Shows in all Library sections From Plex', action='store_true', default=False)
+    add_option(group_libraries, '--allmovies', help='Grab All Movies in all Library sections From Plex', action='store_true', default=False)
+    add_option(group_libraries, '--select-library', '-l', help='Choose between library sections of both TV Shows or Movies to build a playlist from (comma seperated within quotes if multiple users)')
     #The Exclude data will be used in conjuction with either --allshows or --allmovies
-    group_libraries.add_argument('--exclude-library', '-e', help='Comma seperated list (if selecting multiple users) of sections to exclude (I.E. "Test Videos,Workout,Home Videos" ) there should be no space between the comma and the first character of the next value', type=str, default="")
-    group_libraries.add_argument('--purge', help='Remove a playlist from plex for the provided user(s)', action='store_true', default=False)  
+    add_option(group_libraries, '--exclude-library', '-e', help='Comma seperated list (if selecting multiple users) of sections to exclude (I.E. "Test Videos,Workout,Home Videos" ) there should be no space between the comma and the first character of the next value', type=str, default="")
+    add_option(group_libraries, '--incremental', help='Update an existing playlist in place with only the changed items instead of recreating it', action='store_true', default=False)
+    add_option(group_libraries, '--purge', help='Remove a playlist from plex for the provided user(s)', action='store_true', default=False)  
     group_users = parser.add_argument_group('User Profile Selection')    
     #Used for Entering the Admin user(s) 
-    group_users.add_argument('--adminuser', '-a', help='Generate playlist for the Plex Admin user profile name that was used to login.', action='store_true', default=False)
+    add_option(group_users, '--adminuser', '-a', help='Generate playlist for the Plex Admin user profile name that was used to login.', action='store_true', default=False)
+    #How the users are connected and how fast requests are sent for them
+    add_option(group_users, '--max-request-rate', help='Maximum number of requests per second sent to plex.tv or the Plex server (default: no limit until the server answers 429/503)', type=float)
+    add_option(group_users, '--http-retries', help='Number of times a failed connection or server error is retried', type=int, default=3)
+    add_option(group_users, '--workers', help='Number of home users to generate playlists for at the same time', type=int, default=1)
+    add_option(group_users, '--token-map', help='Connect the home users with their server tokens from one bulk plex.tv listing instead of switching to each user', action='store_true', default=False)
+    add_option(group_users, '--home-token-ttl', help='Seconds the server token of a home user is cached for (on disk with --cache-dir)', type=int, default=86400)
     #The Plex Profile Names for the home users
-    group_users.add_argument('--homeusers', help='Generate playlist for the provided Plex home users (comma seperated within quotes if multiple users). For all plex home users type \"all\"', type=str)
+    add_option(group_users, '--homeusers', help='Generate playlist for the provided Plex home users (comma seperated within quotes if multiple users). For all plex home users type \"all\"', type=str)
     
 
-    return parser.parse_args()
+    return parser
+
+
+def get_args():
+    return get_parser().parse_args()
+
+
+#The plex library section types (section.type) for TV Shows, Movies, Music and Photos
+SHOW_SECTION_TYPE = 'show'
+MOVIE_SECTION_TYPE = 'movie'
+MUSIC_SECTION_TYPE = 'artist'
+PHOTO_SECTION_TYPE = 'photo'
+
+#Section catalogs already built for a connection, keyed by the server url and token of the connection
+section_catalogs = dict()
+
+
+class SectionCatalog:
+    """The library sections of a plex connection, fetched once and grouped by section type"""
+
+    def __init__(self, plex):
+        self.sections = plex.library.sections()
+        self.sections_by_title = {section.title: section for section in self.sections}
+
+    def titles(self, section_type=None):
+        """Returns the titles of all sections, or only of the sections of the given type"""
+        return [section.title for section in self.sections if section_type is None or section.type == section_type]
+
+    def section(self, title):
+        """Returns the section with the given title, raising NotFound like plex.library.section()"""
+        try:
+            return self.sections_by_title[title]
+        except KeyError:
+            raise NotFound(f'Invalid library section: {title}') from None
+
+
+def get_section_catalog(plex):
+    """Returns the section catalog of the plex connection, fetching the library sections only on first use"""
+    connection_key = (plex._baseurl, plex._token)
+    if connection_key not in section_catalogs:
+        section_catalogs[connection_key] = SectionCatalog(plex)
+    return section_catalogs[connection_key]
+
+
+#The library types stored in the metadata cache for each library section type
+CACHED_LIBTYPES = {SHOW_SECTION_TYPE: ['show', 'season', 'episode'],
+                   MOVIE_SECTION_TYPE: ['movie']}
+
+
+class MediaRecord:
+    """A show, season, episode or movie candidate
+
+    Records are read from the metadata cache or parsed straight from the XML of a listing and only hold the fields
+    used to select, print and add the item to a playlist, not the parsed XML element and server reference of a plex object.
+    """
+
+    __slots__ = ('ratingKey', 'type', 'guid', 'title', 'parentRatingKey', 'grandparentRatingKey',
+                 'parentIndex', 'index', 'parentTitle', 'grandparentTitle', 'viewCount', 'librarySectionTitle')
+
+    def __init__(self, row, viewCount=None, librarySectionTitle=None):
+        (self.ratingKey, self.type, self.guid, self.title, self.parentRatingKey, self.grandparentRatingKey,
+         self.parentIndex, self.index, self.parentTitle, self.grandparentTitle) = row
+        self.viewCount = viewCount
+        self.librarySectionTitle = librarySectionTitle
+
+    @property
+    def TYPE(self):
+        return self.type
+
+    @property
+    def seasonNumber(self):
+        return self.parentIndex
+
+    @property
+    def seasonEpisode(self):
+        return f's{str(self.parentIndex).zfill(2)}e{str(self.index).zfill(2)}'
+
+    def __repr__(self):
+        return f'<MediaRecord:{self.ratingKey}:{self.title}>'
+
+
+def element_row(elem):
+    """Returns the MediaRecord row of a library item element"""
+    return (plex_utils.cast(int, elem.attrib.get('ratingKey')), elem.attrib.get('type'), elem.attrib.get('guid'),
+            elem.attrib.get('title'), plex_utils.cast(int, elem.attrib.get('parentRatingKey')),
+            plex_utils.cast(int, elem.attrib.get('grandparentRatingKey')), plex_utils.cast(int, elem.attrib.get('parentIndex')),
+            plex_utils.cast(int, elem.attrib.get('index')), elem.attrib.get('parentTitle'), elem.attrib.get('grandparentTitle'))
+
+
+def element_records(data, libtype):
+    """Returns the items of the libtype in the MediaContainer element as MediaRecord records"""
+    section_title = data.attrib.get('librarySectionTitle')
+    return [MediaRecord(element_row(elem), plex_utils.cast(int, elem.attrib.get('viewCount')),
+                        elem.attrib.get('librarySectionTitle', section_title))
+            for elem in data if elem.attrib.get('type') == libtype]
+
+
+def iter_items(server, key, libtype):
+    """Yields the items of the libtype listed by the key as MediaRecord records, a page of BULK_CONTAINER_SIZE at a time
+
+    Only one page is parsed at a time, so memory is bounded by the page size and by what the caller keeps of the items.
+    """
+    container_start = 0
+    while True:
+        headers = {'X-Plex-Container-Start': str(container_start), 'X-Plex-Container-Size': str(BULK_CONTAINER_SIZE)}
+        data = server.query(key, headers=headers)
+        yield from element_records(data, libtype)
+
+        container_start += len(data)
+        total_size = int(data.attrib.get('totalSize') or data.attrib.get('size') or 0)
+        if len(data) == 0 or container_start >= total_size:
+            break
+
+
+def iter_section_items(section, libtype, unwatched=False, watched=False):
+    """Yields the (unwatched or watched) items of the libtype in the section as MediaRecord records, a page at a time"""
+    params = {'type': plex_utils.searchType(libtype), 'includeCollections': 0}
+    if unwatched is True:
+        params['unwatched'] = 1
+    elif watched is True:
+        params['unwatched'] = 0
+    return iter_items(section._server, f'/library/sections/{section.key}/all{plex_utils.joinArgs(params)}', libtype)
+
+
+def reservoir_sample(items, sample_size):
+    """Returns sample_size random items of the iterable while only keeping sample_size of them (reservoir sampling)"""
+    reservoir = list()
+    for seen, item in enumerate(items):
+        if seen < sample_size:
+            reservoir.append(item)
+        else:
+            position = random.randrange(seen + 1)
+            if position < sample_size:
+                reservoir[position] = item
+    return reservoir
+
+
+class MetadataCache:
+    """SQLite cache of the shows, seasons, episodes and movies of each library section (--cache-dir)
+
+    Rows are keyed by the server machineIdentifier and section key. Every run only pulls the items updated (or added)
+    since the newest item of the last sync, a section is fully resynced once it is older than --cache-max-age or when
+    --refresh-cache is used. Deleted items do not show up as updated, so whenever the section's updatedAt changed the
+    cached ratingKeys are compared with the ones on the server and the stale rows are dropped.
+    """
+
+    ITEM_COLUMNS = ('rating_key, type, guid, title, parent_rating_key, grandparent_rating_key, '
+                    'parent_index, item_index, parent_title, grandparent_title')
+
+    def __init__(self, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, 'plex_metadata.sqlite'), check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS sections (
+                machine_id TEXT, section_key INTEGER, synced_at REAL,
+                PRIMARY KEY (machine_id, section_key));
+            CREATE TABLE IF NOT EXISTS items (
+                machine_id TEXT, section_key INTEGER, rating_key INTEGER, type TEXT, guid TEXT, title TEXT,
+                parent_rating_key INTEGER, grandparent_rating_key INTEGER, parent_index INTEGER, item_index INTEGER,
+                parent_title TEXT, grandparent_title TEXT, updated_at INTEGER, added_at INTEGER,
+                PRIMARY KEY (machine_id, rating_key));
+            CREATE INDEX IF NOT EXISTS items_section ON items (machine_id, section_key, type);
+        """)
+        #Caches written before the section updatedAt was kept
+        if 'section_updated_at' not in [column[1] for column in self.db.execute('PRAGMA table_info(sections)')]:
+            self.db.execute('ALTER TABLE sections ADD COLUMN section_updated_at INTEGER')
+        self.lock = threading.Lock()
+
+    def section(self, plex, section):
+        """Returns the items of the section and the episodes of each show by the show ratingKey, syncing the section first"""
+        with self.lock:
+            self.sync(plex, section)
+
+            section_type_libtypes = CACHED_LIBTYPES.get(section.type, list())
+            items = self.load(plex, section, section_type_libtypes[0]) if section_type_libtypes else list()
+            episodes_by_show = dict()
+            if section.type == SHOW_SECTION_TYPE:
+                for episode in self.load(plex, section, 'episode'):
+                    episodes_by_show.setdefault(episode.grandparentRatingKey, list()).append(episode)
+
+        return items, episodes_by_show
+
+    def load(self, plex, section, libtype):
+        """Returns the cached items of the libtype in the section, episodes in season and episode order"""
+        rows = self.db.execute(f'SELECT {self.ITEM_COLUMNS} FROM items WHERE machine_id = ? AND section_key = ? AND type = ? '
+                               f'ORDER BY grandparent_rating_key, parent_index, item_index',
+                               (plex.machineIdentifier, section.key, libtype))
+        return [MediaRecord(row, librarySectionTitle=section.title) for row in rows]
+
+    def sync(self, plex, section):
+        """Brings the cached items of the section up to date with the server"""
+        machine_id = plex.machineIdentifier
+        row = self.db.execute('SELECT synced_at, section_updated_at FROM sections WHERE machine_id = ? AND section_key = ?',
+                              (machine_id, section.key)).fetchone()
+        full_sync = (row is None) or (args.refresh_cache == True) or (time.time() - row[0] > args.cache_max_age)
+        section_updated_at = int(section.updatedAt.timestamp()) if getattr(section, 'updatedAt', None) else None
+        section_changed = (row is None) or (section_updated_at is None) or (row[1] != section_updated_at)
+
+        with self.db:
+            if full_sync:
+                logger.debug(f'CACHE: Full sync of \"{section.title}\"')
+                self.db.execute('DELETE FROM items WHERE machine_id = ? AND section_key = ?', (machine_id, section.key))
+
+            for libtype in CACHED_LIBTYPES.get(section.type, list()):
+                since = None
+                if not full_sync:
+                    #MAX(a, NULL) is NULL in SQLite, so a column without any timestamps must not hide the other one
+                    since = self.db.execute('SELECT MAX(COALESCE(MAX(updated_at), MAX(added_at)), COALESCE(MAX(added_at), MAX(updated_at))) '
+                                            'FROM items WHERE machine_id = ? AND section_key = ? AND type = ?',
+                                            (machine_id, section.key, libtype)).fetchone()[0]
+
+                self.store(plex, section, libtype, since)
+
+                #Deleted items do not show up as updated, drop the cached ratingKeys the server no longer has
+                if since is not None and section_changed:
+                    server_keys = self.rating_keys(plex, section, libtype)
+                    cached_keys = {row[0] for row in self.db.execute('SELECT rating_key FROM items WHERE machine_id = ? AND section_key = ? AND type = ?',
+                                                                     (machine_id, section.key, libtype))}
+                    stale_keys = cached_keys - server_keys
+                    if stale_keys:
+                        logger.debug(f'CACHE: Dropping {len(stale_keys)} deleted {libtype}s of \"{section.title}\"')
+                        self.db.executemany('DELETE FROM items WHERE machine_id = ? AND rating_key = ?',
+                                            [(machine_id, rating_key) for rating_key in stale_keys])
+                    if server_keys - cached_keys:
+                        logger.debug(f'CACHE: {libtype}s of \"{section.title}\" are missing from the cache, resyncing them')
+                        self.store(plex, section, libtype)
+
+            if full_sync:
+                self.db.execute('INSERT OR REPLACE INTO sections VALUES (?, ?, ?, ?)',
+                                (machine_id, section.key, time.time(), section_updated_at))
+            else:
+                self.db.execute('UPDATE sections SET section_updated_at = ? WHERE machine_id = ? AND section_key = ?',
+                                (section_updated_at, machine_id, section.key))
+
+    def store(self, plex, section, libtype, since=None):
+        """Fetches the items of the libtype updated since the timestamp (all of them without one) into the cache"""
+        key = f'/library/sections/{section.key}/all?type={plex_utils.searchType(libtype)}&includeCollections=0'
+        if since is not None:
+            key += f'&updatedAt>>={since}'
+
+        container_start = 0
+        while True:
+            headers = {'X-Plex-Container-Start': str(container_start), 'X-Plex-Container-Size': str(BULK_CONTAINER_SIZE)}
+            data = plex.query(key, headers=headers)
+            elems = [elem for elem in data if elem.attrib.get('type') == libtype]
+            self.db.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                [(plex.machineIdentifier, section.key) + element_row(elem) +
+                                 (plex_utils.cast(int, elem.attrib.get('updatedAt')), plex_utils.cast(int, elem.attrib.get('addedAt')))
+                                 for elem in elems])
+
+            container_start += len(data)
+            total_size = int(data.attrib.get('totalSize') or data.attrib.get('size') or 0)
+            if len(data) == 0 or container_start >= total_size:
+                break
+
+        logger.debug(f'CACHE: Stored {container_start} {libtype}s of \"{section.title}\" updated since {since}')
+
+    def rating_keys(self, plex, section, libtype):
+        """Returns the ratingKeys of every item of the libtype in the section on the server"""
+        key = f'/library/sections/{section.key}/all?type={plex_utils.searchType(libtype)}&includeCollections=0'
+        rating_keys = set()
+        container_start = 0
+        while True:
+            headers = {'X-Plex-Container-Start': str(container_start), 'X-Plex-Container-Size': str(BULK_CONTAINER_SIZE)}
+            data = plex.query(key, headers=headers)
+            rating_keys.update(plex_utils.cast(int, elem.attrib.get('ratingKey')) for elem in data if elem.attrib.get('type') == libtype)
+
+            container_start += len(data)
+            total_size = int(data.attrib.get('totalSize') or data.attrib.get('size') or 0)
+            if len(data) == 0 or container_start >= total_size:
+                break
+        return rating_keys
+
+
+#The persistent metadata cache (--cache-dir)
+metadata_cache = None
+
+
+class LibrarySnapshot:
+    """The shows, episodes and movies of the library sections, fetched once with the admin connection (--shared-snapshot)
+
+    Every user connection only fetches the ratingKeys it has watched and overlays them on the snapshot, connections of
+    restricted home users also fetch the ratingKeys they can see so items hidden from them (labels, content ratings) are left out.
+    Sections are fetched the first time any user asks for them, from the metadata cache when --cache-dir is used.
+    """
+
+    def __init__(self, plex):
+        self.plex = plex
+        #Section title -> (shows or movies, episodes of each show by the show ratingKey)
+        self.sections = dict()
+        #One lock per section title, so users asking for different sections fetch them at the same time
+        self.section_locks = dict()
+        self.lock = threading.Lock()
+
+    def section(self, title):
+        """Returns the items of the section and the episodes of each show, fetching them on first use"""
+        with self.lock:
+            section_lock = self.section_locks.setdefault(title, threading.Lock())
+
+        with section_lock:
+            if title not in self.sections and metadata_cache is not None:
+                section = get_section_catalog(self.plex).section(title)
+                self.sections[title] = metadata_cache.section(self.plex, section)
+
+            elif title not in self.sections:
+                section = get_section_catalog(self.plex).section(title)
+                section_type_libtypes = CACHED_LIBTYPES.get(section.type, list())
+                items = list(iter_section_items(section, section_type_libtypes[0])) if section_type_libtypes else list()
+                episodes_by_show = dict()
+
+                if section.type == SHOW_SECTION_TYPE:
+                    for episode in iter_section_items(section, 'episode'):
+                        episodes_by_show.setdefault(episode.grandparentRatingKey, list()).append(episode)
+                    for episodes in episodes_by_show.values():
+                        episodes.sort(key=lambda episode: (episode.parentIndex or 0, episode.index or 0))
+
+                logger.debug(f'SNAPSHOT: Fetched {len(items)} items of \"{title}\"')
+                self.sections[title] = (items, episodes_by_show)
+            return self.sections[title]
+
+    def get_candidates(self, plex, all_provided_sections):
+        """Returns the number of candidate shows and movies, the unwatched (or all with --include-watched) shows, movies and
+        show episodes of the user of the connection, and the (season, episode) pairs present in the library for each show"""
+        catalog = get_section_catalog(plex)
+        candidate_count = 0
+        all_shows = list()
+        all_movies = list()
+        show_episodes = dict()
+        present_episodes = dict()
+
+        for provided_section in all_provided_sections:
+            items, episodes_by_show = self.section(provided_section)
+            section = catalog.section(provided_section)
+
+            #The snapshot is fetched with the admin connection, restricted users only get the items they can see
+            if (plex._baseurl, plex._token) in restricted_connections and section.type in CACHED_LIBTYPES:
+                visible_keys = get_visible_keys(section, CACHED_LIBTYPES[section.type][0])
+                items = [item for item in items if item.ratingKey in visible_keys]
+
+            if section.type == SHOW_SECTION_TYPE:
+                watched_keys = set() if args.include_watched is True else get_watched_keys(section, 'episode')
+                for show in items:
+                    episodes = [episode for episode in episodes_by_show.get(show.ratingKey, list())
+                                if episode.ratingKey not in watched_keys]
+                    if args.include_watched is True:
+                        #Grab Watched Episodes but ignore Season 0 (Specials)
+                        episodes = [episode for episode in episodes if episode.parentIndex != 0]
+                    if not episodes:
+                        continue
+
+                    all_shows.append(show)
+                    candidate_count += 1
+                    if show.title in BLACKLIST:
+                        logger.debug(f'GET_EPISODES: Show Blacklisted: {show.title}')
+                        continue
+                    show_episodes[show.title] = episodes
+                    if args.ignore_skipped is False:
+                        present_episodes[show.title] = index_episodes(episodes_by_show.get(show.ratingKey, list()))
+
+            elif section.type == MOVIE_SECTION_TYPE:
+                watched_keys = set() if args.include_watched is True else get_watched_keys(section, 'movie')
+                movies = [movie for movie in items if movie.ratingKey not in watched_keys]
+                all_movies.extend(movies)
+                candidate_count += len(movies)
+
+        return candidate_count, all_shows, all_movies, show_episodes, present_episodes
+
+
+def get_visible_keys(section, libtype):
+    """Returns the ratingKeys of every item of the libtype the user of the connection can see in the section"""
+    visible_keys = {item.ratingKey for item in iter_section_items(section, libtype)}
+    logger.debug(f'SNAPSHOT: {len(visible_keys)} visible {libtype}s in \"{section.title}\"')
+    return visible_keys
+
+
+def get_watched_keys(section, libtype):
+    """Returns the ratingKeys of every item of the libtype the user of the connection has watched"""
+    watched_keys = {item.ratingKey for item in iter_section_items(section, libtype, watched=True)}
+    logger.debug(f'SNAPSHOT: {len(watched_keys)} watched {libtype}s in \"{section.title}\"')
+    return watched_keys
+
+
+#The library snapshot shared by every user of the run (--shared-snapshot), and the snapshot of each admin connection
+#shared by every job of the run (--jobs)
+library_snapshot = None
+library_snapshots = dict()
+
+
+def get_library_snapshot(plex):
+    """Returns the library snapshot of the admin connection, creating it on first use"""
+    connection_key = (plex._baseurl, plex._token)
+    if connection_key not in library_snapshots:
+        library_snapshots[connection_key] = LibrarySnapshot(plex)
+    return library_snapshots[connection_key]
+
+
+def run_concurrently(calls):
+    """Runs the blocking plex calls concurrently on an asyncio event loop (--async) and returns their results in order
+
+    The calls share the pooled HTTP session and at most --async-concurrency of them are in flight at the same time.
+    Each call runs in a copy of the caller's context, so it sees the options and output buffer of the home user.
+    """
+    async def run_all():
+        semaphore = asyncio.Semaphore(args.async_concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def run(call):
+            async with semaphore:
+                #asyncio.to_thread needs Python 3.9
+                return await loop.run_in_executor(None, functools.partial(contextvars.copy_context().run, call))
+
+        return await asyncio.gather(*(run(call) for call in calls))
+
+    return asyncio.run(run_all())
+
+
+def fetch_sections_concurrently(catalog, all_provided_sections, requested_playlist_items):
+    """Lists the provided sections concurrently (--async)
+
+    Returns the same candidate count, shows, movies and show sections as the section loop of get_random_episodes_or_movies.
+    """
+    sections = [catalog.section(provided_section) for provided_section in all_provided_sections]
+
+    #Every show of the show sections, and the number of candidate shows or movies of every section
+    show_sections = [section for section in sections if section.type == SHOW_SECTION_TYPE]
+    movie_sections = [section for section in sections if section.type == MOVIE_SECTION_TYPE]
+    listings = run_concurrently([lambda section=section: section.all() for section in show_sections] +
+                                [lambda section=section: count_section_items(section)
+                                 for section in show_sections + movie_sections])
+    section_shows = listings[:len(show_sections)]
+    show_counts = listings[len(show_sections):2 * len(show_sections)]
+    movie_counts = listings[2 * len(show_sections):]
+
+    all_shows = [show for shows in section_shows for show in shows]
+    all_movies = sample_section_movies(movie_sections, movie_counts, requested_playlist_items)
+    candidate_count = sum(show_counts) + sum(movie_counts)
+
+    return candidate_count, all_shows, all_movies, show_sections
+
+
+def query_section_items(section, container_size, sort=None):
+    """Queries the (unwatched) items of the section, returning at most container_size of them"""
+    params = {'includeCollections': 0, 'X-Plex-Container-Start': 0, 'X-Plex-Container-Size': container_size}
+    if args.include_watched is not True:
+        params['unwatched'] = 1
+    if sort is not None:
+        params['sort'] = sort
+    return section._server.query(f'/library/sections/{section.key}/all{plex_utils.joinArgs(params)}')
+
+
+def count_section_items(section):
+    """Returns the number of (unwatched) items of the section with a container size 0 query instead of downloading them"""
+    data = query_section_items(section, 0)
+    return int(data.attrib.get('totalSize') or 0)
+
+
+def split_draws(counts, draws):
+    """Splits the draws across the sections weighted by their counts, never giving a section more draws than its count"""
+    shares = [0] * len(counts)
+    remaining = list(counts)
+    for _ in range(min(draws, sum(remaining))):
+        index = random.choices(range(len(remaining)), weights=remaining)[0]
+        shares[index] += 1
+        remaining[index] -= 1
+    return shares
+
+
+def sample_section_movies(sections, counts, requested_playlist_items):
+    """Returns random (unwatched) movies of the movie sections, drawn by the server with a random sort
+
+    The requested number of movies is split across the sections weighted by their counts (at most a section's count),
+    and each section returns MOVIE_SAMPLE_OVERDRAW more than its share to make up for blacklisted movies. A section that
+    still falls short of its share is listed in full instead, and what it cannot give is split across the other sections.
+    """
+    def sample(section, count, share, sampled):
+        """Returns the eligible movies sampled before plus enough new ones to cover the share, if the section has them"""
+        if len(sampled) >= share:
+            return sampled
+
+        container_size = min(count, int(share * (1 + MOVIE_SAMPLE_OVERDRAW)) + 1)
+        movies = element_records(query_section_items(section, container_size, sort='random'), 'movie')
+        sampledKeys = {movie.ratingKey for movie in sampled}
+        eligible = sampled + [movie for movie in movies if movie.title not in BLACKLIST and movie.ratingKey not in sampledKeys]
+        logger.debug(f'GET_EPISODES: Sampled {len(eligible)} of {count} movies from "{section.title}" for {share} draws')
+
+        if len(eligible) < share and len(movies) < count:
+            logger.debug(f'GET_EPISODES: Too many blacklisted movies in the sample of "{section.title}", streaming the section')
+            eligible = reservoir_sample((movie for movie in iter_section_items(section, 'movie', unwatched=args.include_watched is not True)
+                                         if movie.title not in BLACKLIST), share)
+        return eligible
+
+    #Draws each section can still take, the draws given to each section and its eligible movies so far
+    capacities = list(counts)
+    shares = [0] * len(sections)
+    samples = [list() for _ in sections]
+    draws = requested_playlist_items
+
+    while draws > 0 and sum(capacities) > 0:
+        moreDraws = split_draws(capacities, draws)
+        indexes = [index for index, more in enumerate(moreDraws) if more > 0]
+        for index in indexes:
+            shares[index] += moreDraws[index]
+            capacities[index] -= moreDraws[index]
+
+        calls = [lambda index=index: sample(sections[index], counts[index], shares[index], samples[index]) for index in indexes]
+        if args.async_engine is True:
+            results = run_concurrently(calls)
+        else:
+            results = [call() for call in calls]
+
+        #A section without enough eligible movies for its share hands the shortfall to the other sections
+        draws = 0
+        for index, movies in zip(indexes, results):
+            samples[index] = movies
+            if len(movies) < shares[index]:
+                draws += shares[index] - len(movies)
+                shares[index] = len(movies)
+                capacities[index] = 0
+
+    return [movie for movies in samples for movie in movies]
 
 
 def get_random_episodes_or_movies(plex, all_provided_sections, requested_playlist_items=10):
 
-    #The name of the library sections type IE (MovieSection, ShowSection, MusicSection, PhotoSection) its used to query the type of data too grab from the plex API
-    getMovieSection = 'MovieSection'
-    getShowSection = 'ShowSection'
-    
-    #use to query and find show sections from the for command if statement
-    getShowSectionSearcher = '<' + getShowSection + colon
-    getMovieSectionSearcher = '<' + getMovieSection + colon
+    #The library sections of this connection, fetched once and shared with create_playlist and build_playlist
+    catalog = get_section_catalog(plex)
 
-    all_shows_or_movies_from_provided_sections = list()
+    #The number of shows and movies that can be drawn, used to cap the playlist
+    candidate_count = 0
     all_shows_from_provided_sections = list()
     all_movies_from_provided_sections = list()
-    
-    #Used to determine whether to append to a empty library section all content, or add to concatinate an existing set of data
-    count = 0
+    show_episodes = dict()
+    #The TV Show library sections, used to bulk fetch episodes per section (--bulk-fetch)
+    show_sections = list()
+    #The Movie library sections and their number of candidate movies, used to sample the movies
+    movie_sections = list()
+    movie_counts = list()
     
 
-    for provided_section in all_provided_sections:
-        if count == 0:
-            if(args.include_watched == True):
-                all_shows_or_movies_from_provided_sections = plex.library.section(provided_section).all()
-                logger.debug(f'\nall_shows_or_movies_from_provided_sections[{count}] = {all_shows_or_movies_from_provided_sections}')
-            else:
-                all_shows_or_movies_from_provided_sections = plex.library.section(provided_section).all(unwatched=True)
-                logger.debug(f'\nall_shows_or_movies_from_provided_sections[{count}] = {all_shows_or_movies_from_provided_sections}')
-                
-            if getShowSectionSearcher in str(plex.library.section(provided_section)):
-                all_shows_from_provided_sections = plex.library.section(provided_section).all()
-                
-            elif getMovieSectionSearcher in str(plex.library.section(provided_section)):
-                if(args.include_watched == True):
-                    logger.debug(f'\nIncluding Watched Movies...\n')
-                    all_movies_from_provided_sections = plex.library.section(provided_section).all()
-                    
-                else:
-                    logger.debug(f'\nExcluding Watched Movies...\n')
-                    all_movies_from_provided_sections = plex.library.section(provided_section).all(unwatched=True)
-                
-            count += 1
-        else:
-            if(args.include_watched == True):
-                all_shows_or_movies_from_provided_sections = all_shows_or_movies_from_provided_sections + plex.library.section(provided_section).all()
-                logger.debug(f'\nall_shows_or_movies_from_provided_sections[{count}] = {all_shows_or_movies_from_provided_sections}')
-            else:
-                all_shows_or_movies_from_provided_sections = all_shows_or_movies_from_provided_sections + plex.library.section(provided_section).all(unwatched=True)
-                logger.debug(f'\nall_shows_or_movies_from_provided_sections[{count}] = {all_shows_or_movies_from_provided_sections}')
+    if library_snapshot is not None:
+        #The metadata comes from the shared library snapshot, only the watch state of this user is fetched
+        (candidate_count, all_shows_from_provided_sections,
+         all_movies_from_provided_sections, snapshot_show_episodes,
+         snapshot_present_episodes) = library_snapshot.get_candidates(plex, all_provided_sections)
 
-   
-            if getShowSectionSearcher in str(plex.library.section(provided_section)):
-                all_shows_from_provided_sections = all_shows_from_provided_sections + plex.library.section(provided_section).all()
+    elif args.async_engine is True:
+        (candidate_count, all_shows_from_provided_sections,
+         all_movies_from_provided_sections, show_sections) = fetch_sections_concurrently(catalog, all_provided_sections,
+                                                                                         requested_playlist_items)
+
+    else:
+        for provided_section in all_provided_sections:
+            section = catalog.section(provided_section)
+
+            if section.type == SHOW_SECTION_TYPE:
+                all_shows_from_provided_sections.extend(section.all())
+                show_sections.append(section)
                 logger.debug(f'\nall_shows_from_provided_sections = {all_shows_from_provided_sections}')
-                
-            elif getMovieSectionSearcher in str(plex.library.section(provided_section)):
+
+                #Only the number of (unwatched) shows is needed, not a second listing of the section
+                section_count = count_section_items(section)
+                candidate_count += section_count
+                logger.debug(f'\ncandidate_count[{section.title}] = {section_count}')
+            
+            elif section.type == MOVIE_SECTION_TYPE:
                 if(args.include_watched == True):
                     #If the user did select to include watched movies with --include-watched
                     logger.debug(f'\nIncluding Watched Movies...\n')
-                    all_movies_from_provided_sections = all_movies_from_provided_sections + plex.library.section(provided_section).all()
-                    
                 else:
                     #If the user did not select to include watched movies with --include-watched
                     logger.debug(f'\nExcluding Watched Movies...\n')
-                    all_movies_from_provided_sections = all_movies_from_provided_sections + plex.library.section(provided_section).all(unwatched=True)
 
-                logger.debug(f'\nall_movies_from_provided_sections = {all_movies_from_provided_sections}')
-                
-            count += 1
+                movie_sections.append(section)
+                movie_counts.append(count_section_items(section))
+                candidate_count += movie_counts[-1]
 
+        #The server draws the random movies, so only about the requested number of movies is downloaded
+        all_movies_from_provided_sections = sample_section_movies(movie_sections, movie_counts, requested_playlist_items)
+        logger.debug(f'\nall_movies_from_provided_sections = {all_movies_from_provided_sections}')
 
-    if len(all_shows_from_provided_sections) > 0:
-        show_episodes = dict()
-        for show in all_shows_from_provided_sections:
-            if args.include_watched is True:
-                if args.randomize is False:
-                    logger.warning("Setting --randomized flag, or playlist will always start at Episode 1 for each series")
-                    args.randomize = True
-                if args.ignore_skipped is False:
-                    logger.warning("Setting --ignore-skipped flag, missing episode check is not compatible with --randomized option flag")
-                    args.ignore_skipped = True
-
-            if show.isWatched and args.include_watched is not True:
-                continue
-            if show.title in BLACKLIST:
-                logger.debug(f'GET_EPISODES: Show Blacklisted: {show.title}')
-                continue
-            if args.include_watched is True:
-                #Grab Watched Episodes but ignore Season 0 (Specials)
-                show_episodes[show.title] = show.episodes(parentIndex__gt=0)
-            else:
-                show_episodes[show.title] = show.unwatched()
-              
 
-            #Get the Season number of the Show
-            getSeasonNumber = show_episodes[show.title][0].seasonNumber
-            
-            # remove series 0 specials
-            while getSeasonNumber == 0:
-                #If the Season Number is 0 remove it from the list of shows and episodes
-                if getSeasonNumber == 0:
-                    season_episode = show_episodes[show.title][0].seasonEpisode
-                    episode_title = show_episodes[show.title][0].title
-
-                    logger.debug(f'get_random_episodes: Series 0 Episode Removed '
-                                 f'{show.title} - {season_episode} - {episode_title} \n')
-                
-                    show_episodes[show.title].pop(0)
-    
-                logger.debug(f'getSeasonNumber [before] = {getSeasonNumber}')
+    if len(all_shows_from_provided_sections) > 0:
+        #The (season, episode) pairs present in the library for each show, used to detect missing episodes (--check-skipped)
+        present_episodes = dict()
+        shows_by_title = {show.title: show for show in all_shows_from_provided_sections}
+        if library_snapshot is not None:
+            show_episodes = snapshot_show_episodes
+            present_episodes = snapshot_present_episodes
+        elif args.lazy_fetch is True:
+            #Episodes are only requested once the show is drawn in the selection loop
+            for show in all_shows_from_provided_sections:
+                if include_show(show):
+                    show_episodes[show.title] = LazyShowEpisodes(show)
+                    present_episodes[show.title] = show_episodes[show.title].present
+        elif args.bulk_fetch is True:
+            #One paginated episode search per section instead of one request per show
+            for show_section in show_sections:
+                show_episodes.update(get_bulk_show_episodes(show_section, all_shows_from_provided_sections, present_episodes))
+        elif args.async_engine is True:
+            #Fetch the episodes of every show concurrently
+            shows = [show for show in all_shows_from_provided_sections if include_show(show)]
+            for show, episodes in zip(shows, run_concurrently([lambda show=show: get_show_episodes(show, present_episodes)
+                                                               for show in shows])):
+                show_episodes[show.title] = episodes
+        else:
+            for show in all_shows_from_provided_sections:
+                if not include_show(show):
+                    continue
+                show_episodes[show.title] = get_show_episodes(show, present_episodes)
 
-                try:
-                    #The position of the new data after applying the pop has not been tested to see if it is a special season yet.
-                    # So rewind the Season count to the beginning in order to test it in the next go around.
-                    # When the new data's season number is equal to 0, it will run the loop again, otherwise it will exit the loop for this iteration.
-                    getSeasonNumber = show_episodes[show.title][0].seasonNumber
-                    logger.debug(f'getSeasonNumber [after] = {getSeasonNumber}')
-                    
-                except IndexError as e:
-                    #If the Index is out of range (this can occur if the seasons after the special seasons have all been watched).
-                    print(f'\nIndex that comes after \"{show.title} - {season_episode} - {episode_title}\" is out of Range :: {e}\n')
-                    break
+        #Read the episodes of each show with a cursor, which also skips Season 0 (Specials)
+        show_episodes = {show_title: episodes if isinstance(episodes, EpisodeCursor) else EpisodeCursor(episodes)
+                         for show_title, episodes in show_episodes.items()}
 
 
     #Used to randomly choose between show or movies if both are supplied
@@ -254,23 +891,25 @@ def get_random_episodes_or_movies(plex, all_provided_sections, requested_playlis
 
     
     #If the playlist item count passed in by the user is larger than the total item count of the selected content then update the value of the playlist to be that of the maximum number of contents passed in to the script
-    if(len(all_shows_or_movies_from_provided_sections)) < requested_playlist_items:
-        requested_playlist_items = len(all_shows_or_movies_from_provided_sections)
+    if candidate_count < requested_playlist_items:
+        requested_playlist_items = candidate_count
         
     #Takes the initial value of the  
     length_of_requested_playlist_items = requested_playlist_items
 
+    #Shows are removed from the pool once they run out of episodes, so they are never drawn again
+    show_pool = ShowPool(show_episodes)
+
+    #Movies are drawn without replacement, so a movie never has to be checked against the playlist
+    movie_sampler = MovieSampler(all_movies_from_provided_sections)
+
     playlist = []
     while len(playlist) < requested_playlist_items:
-        #Using The list of Shows
-        if len(all_shows_from_provided_sections) > 0:
-            show_or_movie_name = random.choice(list(show_episodes.keys()))
-            shows_available = True
-            
-        #Using The list of Movies.
-        if (all_movies_from_provided_sections):                
-            show_or_movie_name = random.choice(all_movies_from_provided_sections)
-            movies_available = True
+        #Using The list of Shows. The pool only has shows left that may still have episodes
+        shows_available = len(show_pool) > 0
+
+        #Using The list of Movies. The sampler only has movies left that were not drawn yet
+        movies_available = movie_sampler.remaining > 0
         
         if(shows_available == True) and (movies_available == True):
             mediaTypeSelector = random.choice(get_show_or_movie)
@@ -281,172 +920,626 @@ def get_random_episodes_or_movies(plex, all_provided_sections, requested_playlis
         elif(shows_available == True) and (movies_available == False):
             mediaTypeSelector = get_show
         
+        #Fewer movies are eligible than requested, keep the ones that were drawn
+        elif playlist:
+            logger.debug(f'GET_EPISODES: Only {len(playlist)} of {requested_playlist_items} items are available')
+            break
+
         else:
             print(f'No available movies or TV Shows available to choose from.')
             exit(1)
 
         #For TV Shows Only
         if (mediaTypeSelector == get_show):
-            show_name = random.choice(list(show_episodes.keys()))
+            show_name = show_pool.choice()
+            episode = show_episodes[show_name].peek()
             
-            if len(show_episodes[show_name]) >0:
-                if args.ignore_skipped is False:
-                    if skipped_missing(all_shows.get(title=show_name), show_episodes[show_name][0]):
-                        continue
-                if args.randomize:
-                    random.shuffle(show_episodes[show_name])
-                    
-                playlist.append(show_episodes[show_name].pop(0))
-
-            else:
+            if episode is None:
                 logger.debug(f'GET_EPISODES: No more unwatched episodes for {show_name}')
+                show_pool.remove(show_name)
                 continue
-        
-        #For Movies Only      
-        elif (mediaTypeSelector == get_movie):
-            
-            #If a list of Blacklisted Media was supplied
-            if(BLACKLIST != None):
-                
-                total_blacklisted_item_count = len(BLACKLIST)
-                blacklistCounter = 0
-        
-                #Try 3 times to add data without it being blacklisted before giving up
-                try_at_least_three_times = 3
 
-                #Three Consecutive attempts. Used for determining how many times consecutively something has been tried to be blackllisted and skipped in the while loop
-                three_consecutive_attempts = 1
-                increment_consecutive_count_one = False
-                increment_consecutive_count_two = False
-                increment_consecutive_count_three = False
-
-            
-                #if all_movies.title in BLACKLIST:
-                for movie in all_movies_from_provided_sections:
-                    if movie.title in BLACKLIST:
-                    
-                        logger.debug(f'GET_EPISODES: Movie Blacklisted: {movie.title}')
-                        blacklistCounter += 1
-
-                        #If the number of times we reach here is greater than BLACKLISTED items count, we are likely in a continuous loop so break pout
-                        if (three_consecutive_attempts >= try_at_least_three_times) and (blacklistCounter > total_blacklisted_item_count):
-                            print(f'Too many attempts being Blacklisted, exiting the loop... ')
-                            break
-                        
-                        else:
-                            #if (increment_consecutive_count_one == False):
-                            if (increment_consecutive_count_one == False):
-                                increment_consecutive_count_one = True
-                                three_consecutive_attempts += 1
-                                continue
-                                
-                            elif (increment_consecutive_count_two == False):
-                                increment_consecutive_count_two = True
-                                three_consecutive_attempts += 1
-                                continue
-                            elif (increment_consecutive_count_three == False):
-                                increment_consecutive_count_three = True
-                                three_consecutive_attempts += 1
-                                print(f'Too many attempts being Blacklisted, exiting the loop... ')
-                                break
-                        
+            if args.ignore_skipped is False:
+                if skipped_missing(shows_by_title[show_name], episode, present_episodes.get(show_name, set())):
+                    if args.randomize:
+                        #Drop the episode, another random episode of the show may still follow the episodes present
+                        show_episodes[show_name].take()
                     else:
-                        #Reset All counters since it was not either not a blacklisted media item or the blacklist counter was not consecutive
-                        three_consecutive_attempts = 0
-                        increment_consecutive_count_one = False
-                        increment_consecutive_count_two = False
-                        increment_consecutive_count_three = False
-
-            if(args.include_watched == True):
-                #If the user selects to include watched movies
-                logger.debug(f'\nIncluding Watched Movies...\n')
-                movie = random.choice(all_movies_from_provided_sections)
-                
-                #Check if the Movie is already in the list, if it is continue
-                if (movie in playlist) and (len(playlist) < requested_playlist_items):
+                        #The next episode stays the same, so the show can not add anything to the playlist anymore
+                        show_pool.remove(show_name)
                     continue
 
-            else:
-                #If the user did not select to include watched movies with --include-watched
-                logger.debug(f'\nExcluding Watched Movies...\n')
-                movie = random.choice(all_movies_from_provided_sections)
+            playlist.append(show_episodes[show_name].take())
+        
+        #For Movies Only      
+        elif (mediaTypeSelector == get_movie):
+            movie = movie_sampler.draw()
 
-                #Check if the Movie is already in the list, if it is continue
-                if (movie in playlist) and (len(playlist) < requested_playlist_items):
-                    continue
+            #Every eligible movie is already in the playlist
+            if movie is None:
+                logger.debug(f'GET_EPISODES: No more movies available')
+                continue
 
             #Append unique movies
             playlist.append(movie)
+
+    #The selected records are added to the playlist by ratingKey, they never need to become plex objects
     return playlist
 
 
 
+class ShowPool:
+    """Names of the shows that may still have episodes, drawn at random and removed in O(1) (array plus index map with swap-remove)"""
+
+    def __init__(self, show_episodes):
+        self.names = list(show_episodes.keys())
+        self.positions = {name: position for position, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def choice(self):
+        return random.choice(self.names)
+
+    def remove(self, name):
+        """Moves the last show into the position of the removed one"""
+        position = self.positions.pop(name)
+        last = self.names.pop()
+        if last != name:
+            self.names[position] = last
+            self.positions[last] = position
+
+
+class MovieSampler:
+    """Draws random movies without replacement, each draw only swaps one entry (sparse partial Fisher-Yates shuffle)"""
+
+    def __init__(self, movies):
+        self.movies = movies
+        self.remaining = len(movies)
+        #Positions of the shuffled index array that were swapped. Every other position still holds its own index
+        self.swapped = {}
+        self.blacklist = set(BLACKLIST or ())
+
+    def draw(self):
+        """Returns the next random movie that is not blacklisted or None once every movie was drawn"""
+        while self.remaining > 0:
+            position = random.randrange(self.remaining)
+            self.remaining -= 1
+            index = self.swapped.get(position, position)
+            #Move the last undrawn index into the drawn position so the undrawn indexes stay in front
+            self.swapped[position] = self.swapped.pop(self.remaining, self.remaining)
+
+            movie = self.movies[index]
+            if movie.title in self.blacklist:
+                logger.debug(f'GET_EPISODES: Movie Blacklisted: {movie.title}')
+                continue
+            return movie
+        return None
+
+
+
+def include_show(show):
+    """Returns True if the episodes of the show are candidates for the playlist"""
+    if show.isWatched and args.include_watched is not True:
+        return False
+    if show.title in BLACKLIST:
+        logger.debug(f'GET_EPISODES: Show Blacklisted: {show.title}')
+        return False
+    return True
+
+
+def get_show_episodes(show, present_episodes):
+    """Fetches the candidate episodes of the show as records, adding the episodes present of the show to present_episodes
+    with --check-skipped. Season 0 (Specials) is skipped by the episode cursor"""
+    if args.include_watched is True:
+        #Grab Watched Episodes
+        return list(iter_items(show._server, f'{show.key}/allLeaves', 'episode'))
+    elif args.ignore_skipped is False:
+        #The unwatched episodes alone do not tell which episodes are missing, keep them all to index the episodes present
+        episodes = list(iter_items(show._server, f'{show.key}/allLeaves', 'episode'))
+        present_episodes[show.title] = index_episodes(episodes)
+        return [episode for episode in episodes if not episode.viewCount]
+    else:
+        return list(iter_items(show._server, f'{show.key}/allLeaves?unwatched=1', 'episode'))
+
+
+def get_bulk_show_episodes(section, shows, present_episodes):
+    """Fetches every candidate episode of a TV Show section with one paginated episode search and groups them by show
+
+    With --check-skipped the watched episodes are fetched too, to add the episodes present of each show to present_episodes.
+    """
+    #Map the show ratingKey (the episode grandparentRatingKey) to the show title
+    show_titles = {show.ratingKey: show.title for show in shows if include_show(show)}
+
+    #The episodes are streamed a page at a time and only the candidates are kept. Season 0 (Specials) is skipped by the cursor
+    unwatched = args.include_watched is not True and args.ignore_skipped is not False
+    section_episodes = iter_section_items(section, 'episode', unwatched=unwatched)
+
+    show_episodes = dict()
+    episode_count = 0
+    for episode in section_episodes:
+        episode_count += 1
+        show_title = show_titles.get(episode.grandparentRatingKey)
+        if show_title is None:
+            continue
+        if args.ignore_skipped is False:
+            present_episodes.setdefault(show_title, set()).add((episode.seasonNumber, episode.index))
+            if episode.viewCount and args.include_watched is not True:
+                continue
+        show_episodes.setdefault(show_title, list()).append(episode)
+
+    logger.debug(f'GET_EPISODES: Bulk fetched {episode_count} episodes from "{section.title}"')
+
+    #Keep the episodes of each show in the same order as show.unwatched()
+    for episodes in show_episodes.values():
+        episodes.sort(key=lambda episode: (episode.parentIndex or 0, episode.index or 0))
+
+    return show_episodes
+
+
+class EpisodeCursor:
+    """Candidate episodes of a show in episode order, read with a cursor instead of popping the front of the list
+
+    Season 0 (Specials) sorts first and is skipped with one bisect on the season number. The next episode is the
+    next one in order, or with --randomize a random remaining one drawn from a lazily shuffled index permutation
+    (sparse partial Fisher-Yates), so a draw never reshuffles or shifts the whole list.
+    """
+
+    def __init__(self, episodes=()):
+        self.episodes = sorted(episodes, key=lambda episode: (episode.parentIndex or 0, episode.index or 0))
+        #Positions of the shuffled index permutation that were swapped (--randomize). Every other position holds its own index
+        self.swapped = dict()
+        #Index of the episode returned by peek() that take() has not consumed yet
+        self.drawn = None
+
+        low, high = 0, len(self.episodes)
+        while low < high:
+            middle = (low + high) // 2
+            if (self.episodes[middle].parentIndex or 0) < 1:
+                low = middle + 1
+            else:
+                high = middle
+        self.position = low
+
+    def fill(self):
+        """Called once every episode was read, LazyShowEpisodes fetches the next page here"""
+
+    def __len__(self):
+        if self.position >= len(self.episodes) and self.drawn is None:
+            self.fill()
+        return len(self.episodes) - self.position + (self.drawn is not None)
+
+    def peek(self):
+        """Returns the episode take() returns next without consuming it, or None once the show has no episodes left"""
+        if self.drawn is None:
+            if len(self) == 0:
+                return None
+            if args.randomize is True:
+                draw = random.randrange(self.position, len(self.episodes))
+                self.drawn = self.swapped.get(draw, draw)
+                #Move the episode at the read position into the drawn position, the read position is never drawn again
+                self.swapped[draw] = self.swapped.pop(self.position, self.position)
+            else:
+                self.drawn = self.position
+            self.position += 1
+        return self.episodes[self.drawn]
+
+    def take(self):
+        episode = self.peek()
+        self.drawn = None
+        return episode
+
+
+class LazyShowEpisodes(EpisodeCursor):
+    """Candidate episodes of a show, fetched a page at a time only once the show is drawn (--lazy-fetch)
+
+    The first page holds LAZY_CONTAINER_SIZE episodes and the page size doubles every time the cursor runs dry.
+    With --randomize the first draw fetches every remaining episode so the shuffle covers the whole show.
+    """
+
+    def __init__(self, show):
+        super().__init__()
+        self.show = show
+        self.container_start = 0
+        self.container_size = LAZY_CONTAINER_SIZE
+        self.exhausted = False
+        #The (season, episode) pairs of every episode fetched so far, which always includes the episodes before the next one
+        self.present = set()
+
+        if args.include_watched is True or args.ignore_skipped is False:
+            self.key = f'{show.key}/allLeaves'
+        else:
+            self.key = f'{show.key}/allLeaves?unwatched=1'
+
+    def fill(self):
+        """Fetches the next page of episodes, skipping Season 0 (Specials) and watched episodes"""
+        while self.position >= len(self.episodes) and not self.exhausted:
+            if args.randomize is True:
+                #Shuffling needs every episode of the show, fetch them in one request
+                self.container_size = max(self.container_size, self.show.leafCount or 0)
+
+            headers = {'X-Plex-Container-Start': str(self.container_start),
+                       'X-Plex-Container-Size': str(self.container_size)}
+            data = self.show._server.query(self.key, headers=headers)
+            page = element_records(data, 'episode')
+            logger.debug(f'GET_EPISODES: Fetched {len(page)} episodes of {self.show.title} from {self.container_start}')
+
+            self.container_start += len(page)
+            total_size = int(data.attrib.get('totalSize') or data.attrib.get('size') or 0)
+            if len(page) < self.container_size or self.container_start >= total_size:
+                self.exhausted = True
+            self.container_size *= 2
+
+            for episode in page:
+                self.present.add((episode.seasonNumber, episode.index))
+                if episode.seasonNumber == 0:
+                    continue
+                if args.include_watched is not True and episode.viewCount:
+                    continue
+                self.episodes.append(episode)
+
+
+class TvdbSeasonCache:
+    """Episode counts of TVDB seasons by (tvdb_id, season), kept for --tvdb-cache-ttl seconds
+
+    The counts are stored on disk when --cache-dir is used. Seasons TVDB does not know are cached as None,
+    so they are not looked up again either.
+    """
+
+    def __init__(self, cache_dir=None):
+        #(tvdb_id, season) -> (episode count or None, time the count was fetched)
+        self.counts = dict()
+        self.db = None
+        self.lock = threading.Lock()
+
+        if cache_dir != None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.db = sqlite3.connect(os.path.join(cache_dir, 'tvdb_seasons.sqlite'), check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS seasons (tvdb_id INTEGER, season INTEGER, episode_count INTEGER, '
+                            'fetched_at REAL, PRIMARY KEY (tvdb_id, season))')
+            for tvdb_id, season, episode_count, fetched_at in self.db.execute('SELECT * FROM seasons'):
+                self.counts[(tvdb_id, season)] = (episode_count, fetched_at)
+
+    def get(self, tvdb_id, season):
+        """Returns (True, episode count or None) for a cached season that has not expired, otherwise (False, None)"""
+        with self.lock:
+            episode_count, fetched_at = self.counts.get((tvdb_id, season), (None, None))
+            if fetched_at is None or time.time() - fetched_at > args.tvdb_cache_ttl:
+                return False, None
+            return True, episode_count
+
+    def set(self, tvdb_id, season_counts):
+        """Stores the episode count (or None) of each season of the series"""
+        fetched_at = time.time()
+        with self.lock:
+            for season, episode_count in season_counts.items():
+                self.counts[(tvdb_id, season)] = (episode_count, fetched_at)
+            if self.db is not None:
+                with self.db:
+                    self.db.executemany('INSERT OR REPLACE INTO seasons VALUES (?, ?, ?, ?)',
+                                        [(tvdb_id, season, episode_count, fetched_at) for season, episode_count in season_counts.items()])
+
+
+#The TVDB client and season cache shared by every lookup of the run
+tvdb_client = None
+tvdb_season_cache = None
+tvdb_lock = threading.Lock()
+
+
+def get_tvdb_season_cache():
+    """Returns the TVDB season cache of the run, loading it on first use"""
+    global tvdb_season_cache
+    with tvdb_lock:
+        if tvdb_season_cache is None:
+            tvdb_season_cache = TvdbSeasonCache(args.cache_dir)
+        return tvdb_season_cache
+
+
 def tvdb_season_count(show, season):
+    global tvdb_client
     tvdb_id = None
     try:
         logger.debug(f'TVDB: Getting show "{show.title}"')
         tvdb_id = int(re.search('thetvdb://([0-9]+)?', show.guid).group(1))
+
+        cached, season_count = get_tvdb_season_cache().get(tvdb_id, season)
+        if cached:
+            logger.debug(f'TVDB: Previous Season Length = {season_count} (cached)')
+            return season_count
+
         if args.tvdb_api_key is None:
             raise RuntimeError(f'TVDB now requires an API key.  Instructions on how to set it up are here:\n\n'
                                f'https://koditips.com/create-tvdb-api-key-tv-database/')
-        tv = tvdb_api.Tvdb(language='en', apikey=args.tvdb_api_key)
-        season_list = tv[tvdb_id][season]
+        with tvdb_lock:
+            if tvdb_client is None:
+                tvdb_client = tvdb_api.Tvdb(language='en', apikey=args.tvdb_api_key)
+            series = tvdb_client[tvdb_id]
+
+        #The whole series is fetched anyway, so cache the length of every season
+        get_tvdb_season_cache().set(tvdb_id, {season_number: len(series[season_number]) for season_number in series})
+        season_list = series[season]
         logger.debug(f'TVDB: Previous Season Length = {len(season_list)}')
         return len(season_list)
     except tvdb_api.tvdb_seasonnotfound:
         logger.warning(f'TVDB: Unable to look up "{show.title}" ({tvdb_id})')
+        get_tvdb_season_cache().set(tvdb_id, {season: None})
         return None
 
 
-def skipped_missing(show, episode):
-    try:
-        season_num = episode.seasonNumber
-        episode_num = episode.index
+def index_episodes(episodes):
+    """Returns the (season, episode) pairs of the episodes"""
+    return {(episode.seasonNumber, episode.index) for episode in episodes}
 
-        if episode.index > 1:
-            logger.debug(f'SKIP_CHECK: Check same Season for {show.title} S{season_num}E{episode_num-1}')
-            show.get(season=episode.seasonNumber, episode=episode.index-1)
-            logger.debug(f'SKIP_CHECK: Passed')
-            return False
-        elif episode.seasonNumber > 1:
-            previous_season_count = tvdb_season_count(show, season_num - 1)
-            if previous_season_count is None:
-                return False
-            logger.debug(f'SKIP_CHECK: Check previous Season for {show.title} S{season_num-1}E{previous_season_count}')
-            # check last episode of previous season
-            show.get(season=episode.seasonNumber - 1, episode=previous_season_count)
-            logger.debug(f'SKIP_CHECK: Passed')
-            return False
-        else:
-            logger.debug(f'SKIP_CHECK: First Episode of First Season. {show.title} {season_num}')
+
+def skipped_missing(show, episode, present_episodes):
+    """Returns True if the episode before the episode is missing from the library
+
+    present_episodes holds the (season, episode) pairs of the show that were already fetched, so only the length of the
+    previous season is looked up (on TVDB) and no request is sent to Plex.
+    """
+    season_num = episode.seasonNumber
+    episode_num = episode.index
+
+    if episode.index > 1:
+        logger.debug(f'SKIP_CHECK: Check same Season for {show.title} S{season_num}E{episode_num-1}')
+        previous_episode = (season_num, episode_num - 1)
+    elif episode.seasonNumber > 1:
+        previous_season_count = tvdb_season_count(show, season_num - 1)
+        if previous_season_count is None:
             return False
-    except NotFound:
+        logger.debug(f'SKIP_CHECK: Check previous Season for {show.title} S{season_num-1}E{previous_season_count}')
+        # check last episode of previous season
+        previous_episode = (season_num - 1, previous_season_count)
+    else:
+        logger.debug(f'SKIP_CHECK: First Episode of First Season. {show.title} {season_num}')
+        return False
+
+    if previous_episode not in present_episodes:
         logger.info(f'SKIP_CHECK: Previous Episode not Found for {show.title} S{season_num}E{episode_num}')
         return True
+    logger.debug(f'SKIP_CHECK: Passed')
+    return False
+
+
+class PlaylistIndex:
+    """The playlists of a plex connection by title, listed once and kept up to date as playlists are created and deleted
+
+    Titles match case insensitively and the first playlist of a title is returned, like plex.playlist(title=...).
+    """
+
+    def __init__(self, plex):
+        #Lowercase title -> playlists with that title, in the order of the listing
+        self.playlists = dict()
+        for playlist in plex.playlists():
+            self.playlists.setdefault(playlist.title.lower(), list()).append(playlist)
+        self.lock = threading.Lock()
+
+    def playlist(self, title):
+        """Returns the playlist with the title, raising NotFound like plex.playlist(title=...)"""
+        with self.lock:
+            playlists = self.playlists.get(title.lower())
+            if not playlists:
+                raise NotFound(f'Unable to find playlist with title "{title}".')
+            return playlists[0]
+
+    def add(self, playlist):
+        """Adds a playlist that was just created"""
+        with self.lock:
+            self.playlists.setdefault(playlist.title.lower(), list()).append(playlist)
+
+    def delete(self, title):
+        """Deletes the playlist with the title from the index and from the server, raising NotFound if it is not indexed
+
+        The playlist leaves the index before the server is asked, so two callers never delete the same playlist.
+        """
+        with self.lock:
+            playlists = self.playlists.get(title.lower())
+            if not playlists:
+                raise NotFound(f'Unable to find playlist with title "{title}".')
+            playlist = playlists.pop(0)
+
+        try:
+            playlist.delete()
+        except Exception:
+            #The playlist is still on the server, keep it in the index
+            with self.lock:
+                self.playlists.setdefault(title.lower(), list()).insert(0, playlist)
+            raise
+
+
+#Playlist index of each plex connection, by base url and token
+playlist_indexes = dict()
+playlist_indexes_lock = threading.Lock()
+
+
+def get_playlist_index(plex):
+    """Returns the playlist index of the plex connection, listing the playlists only on first use"""
+    connection_key = (plex._baseurl, plex._token)
+    with playlist_indexes_lock:
+        if connection_key not in playlist_indexes:
+            playlist_indexes[connection_key] = PlaylistIndex(plex)
+        return playlist_indexes[connection_key]
 
 
 def delete_playlist(plex, account, playlistName):
     try:
         print(f'deleting playlist \"{playlistName}\"...')
-        plex.playlist(title=playlistName).delete()
+        get_playlist_index(plex).delete(playlistName)
         print(f'\nplaylist \"{playlistName}\" deleted successfully.\n')
-        
-        #If the user is deleting all instances of the playlist then sleeps are added to avoid hitting the too many request exception
-        if(args.purge):
-            time.sleep(5)
 
     except NotFound:
         logger.debug(f"Playlist {playlistName} does not exist to delete.")
-        
-        #If the user is deleting all instances of the playlist (whether it exist or not on a users account) then sleeps are added to avoid hitting the too many request exception
-        if(args.purge):
-            time.sleep(10)
 
     except BadRequest as e:
         print(f'\nError - BadRequest: {e}\n')
         exit(1)
 
 
+def delete_existing_playlist(plex):
+    """Deletes the playlist with the name of the playlist being generated, if it already exist"""
+    try:
+        #If a playlist with the same name already exist, delete it
+        if get_playlist_index(plex).playlist(args.name):
+            print(f'The playlist "{args.name}" already exist.')
+            print(f'deleting playlist "{args.name}" ...')
+            get_playlist_index(plex).delete(args.name)
+
+    except NotFound as e: 
+        logger.debug(f"Playlist {args.name} does not exist to delete.")
+
+
+def get_playlist_items(plex, plex_refined_library_sections):
+    """Selects the playlist items, then deletes the existing playlist of the same name
+
+    The old playlist is only deleted once the selection succeeded, so a selection that fails keeps it.
+    """
+    episode_or_movie = get_random_episodes_or_movies(plex, plex_refined_library_sections, args.number)
+
+    #With --incremental the existing playlist is updated in place instead
+    if args.incremental is not True:
+        delete_existing_playlist(plex)
+
+    return episode_or_movie
+
+
+def write_playlist(plex, episode_or_movie):
+    """Creates the playlist, or with --incremental updates the existing playlist of the same name to the items"""
+    if args.incremental is True:
+        try:
+            playlist = get_playlist_index(plex).playlist(args.name)
+        except NotFound:
+            logger.debug(f"Playlist {args.name} does not exist to update.")
+        else:
+            if not playlist.smart:
+                print(f'The playlist "{args.name}" already exist.')
+                print(f'updating playlist "{args.name}" ...')
+                return update_playlist(plex, playlist, episode_or_movie)
+
+            print(f'deleting smart playlist "{args.name}" ...')
+            get_playlist_index(plex).delete(args.name)
+
+    #Create Playlist, and fill it immediately 
+    return create_playlist_from_keys(plex, args.name, episode_or_movie)
+
+
+def playlist_uris(plex, items):
+    """Yields the server:// uris of the items by ratingKey, split so no uri is longer than PLAYLIST_URI_MAX_LENGTH"""
+    prefix = f'server://{plex.machineIdentifier}/com.plexapp.plugins.library/library/metadata/'
+    ratingKeys = list()
+    length = len(prefix)
+    for item in items:
+        ratingKey = str(item.ratingKey)
+        if ratingKeys and length + len(ratingKey) + 1 > PLAYLIST_URI_MAX_LENGTH:
+            yield prefix + ','.join(ratingKeys)
+            ratingKeys = list()
+            length = len(prefix)
+        ratingKeys.append(ratingKey)
+        length += len(ratingKey) + 1
+    if ratingKeys:
+        yield prefix + ','.join(ratingKeys)
+
+
+def create_playlist_from_keys(plex, title, items):
+    """Creates a video playlist of the items from their ratingKeys, without needing the items as plex objects
+
+    The playlist is created with the first PLAYLIST_URI_MAX_LENGTH of items and filled with the rest in further requests.
+    """
+    uris = playlist_uris(plex, items)
+    uri = next(uris, None)
+    if uri is None:
+        raise BadRequest('Must include items to add when creating new playlist.')
+
+    key = f'/playlists{plex_utils.joinArgs({"uri": uri, "type": "video", "title": title, "smart": 0})}'
+    playlist = Playlist(plex, plex.query(key, method=plex._session.post)[0], initpath=key)
+    for uri in uris:
+        add_playlist_uri(plex, playlist, uri)
+    get_playlist_index(plex).add(playlist)
+    return playlist
+
+
+def add_playlist_items(plex, playlist, items):
+    """Adds the items to the end of the playlist by their ratingKeys, in as few requests as the uri length allows"""
+    for uri in playlist_uris(plex, items):
+        add_playlist_uri(plex, playlist, uri)
+
+
+def add_playlist_uri(plex, playlist, uri):
+    plex.query(f'{playlist.key}/items{plex_utils.joinArgs({"uri": uri})}', method=plex._session.put)
+
+
+def update_playlist(plex, playlist, episode_or_movie):
+    """Turns the items of the existing playlist into the items, in order, keeping the playlist (and its ratingKey)
+
+    Only the items that are no longer wanted are removed, only the new items are added, and only the items that
+    are out of order (not part of the longest run already in order) are moved.
+    """
+    desiredKeys = [item.ratingKey for item in episode_or_movie]
+    desiredKeySet = set(desiredKeys)
+
+    #Remove the items that are no longer wanted, and any duplicates
+    keptKeys = set()
+    for item in plex.fetchItems(f'{playlist.key}/items'):
+        if item.ratingKey in desiredKeySet and item.ratingKey not in keptKeys:
+            keptKeys.add(item.ratingKey)
+            continue
+        logger.debug(f'UPDATE_PLAYLIST: Removing {item.title}')
+        plex.query(f'{playlist.key}/items/{item.playlistItemID}', method=plex._session.delete)
+
+    #Add the new items at the end of the playlist by ratingKey
+    newItems = [item for item in episode_or_movie if item.ratingKey not in keptKeys]
+    if newItems:
+        logger.debug(f'UPDATE_PLAYLIST: Adding {len(newItems)} items')
+        add_playlist_items(plex, playlist, newItems)
+
+    if not keptKeys:
+        return playlist
+
+    #The playlist now holds exactly the wanted items, move the ones that are out of order
+    playlistItems = plex.fetchItems(f'{playlist.key}/items')
+    playlistItemIDs = {item.ratingKey: item.playlistItemID for item in playlistItems}
+    positions = {item.ratingKey: position for position, item in enumerate(playlistItems)}
+    inOrderKeys = longest_increasing_run(desiredKeys, positions)
+
+    for index, ratingKey in enumerate(desiredKeys):
+        if ratingKey in inOrderKeys:
+            continue
+        key = f'{playlist.key}/items/{playlistItemIDs[ratingKey]}/move'
+        if index > 0:
+            key += f'?after={playlistItemIDs[desiredKeys[index - 1]]}'
+        logger.debug(f'UPDATE_PLAYLIST: Moving item {ratingKey}')
+        plex.query(key, method=plex._session.put)
+
+    return playlist
+
+
+def longest_increasing_run(keys, positions):
+    """Returns the largest set of keys whose current positions are already in the order of keys"""
+    #Patience sorting: tails[length - 1] is the index into keys of the smallest tail of an increasing run of that length
+    tails = list()
+    previous = [None] * len(keys)
+    for index, key in enumerate(keys):
+        position = positions[key]
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if positions[keys[tails[middle]]] < position:
+                low = middle + 1
+            else:
+                high = middle
+        previous[index] = tails[low - 1] if low > 0 else None
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+
+    inOrderKeys = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        inOrderKeys.add(keys[index])
+        index = previous[index]
+    return inOrderKeys
+
+
 #Loops through and builds the playlist
 #Arguments are the plex connection, the name of the user we are acting as for playlist generation, the formatted plex library sections, and the Excluded List of Library Sections
 def build_playlist(plex, userName, plex_refined_library_sections, selectionsToExclude_List):  
@@ -473,31 +1566,18 @@ def build_playlist(plex, userName, plex_refined_library_sections, selectionsToEx
         randomSelectedLibrary = random.choice(plex_refined_library_sections)
 
 
-    getPlexLibrarySection = plex.library.section(randomSelectedLibrary)
-
-    randomSelectedLibrary = random.choice(plex_refined_library_sections)
-    
     logger.debug(f'\nSelected Library: \"{randomSelectedLibrary}\"\n')
 
-    getPlexLibrarySection = plex.library.section(randomSelectedLibrary)
+    getPlexLibrarySection = get_section_catalog(plex).section(randomSelectedLibrary)
     logger.debug(f'getPlexLibrarySection = {getPlexLibrarySection}')       
         
     if (args.select_library != None) or ((args.allshows == True) and (args.allmovies == True)):
 
-        episode_or_movie = get_random_episodes_or_movies(plex, plex_refined_library_sections, args.number)
-        
-        try:
-            #If a playlist with the same name already exist, delete it
-            if plex.playlist(title=args.name):
-                print(f'The playlist "{args.name}" already exist.')
-                print(f'deleting playlist "{args.name}" ...')
-                plex.playlist(title=args.name).delete()
-
-        except NotFound as e: 
-            logger.debug(f"Playlist {args.name} does not exist to delete.")
+        #Select the playlist items and delete the existing playlist of the same name
+        episode_or_movie = get_playlist_items(plex, plex_refined_library_sections)
 
         #Create Playlist, and fill it immediately 
-        createdPlaylist = Playlist.create(server=plex, title=args.name, items=episode_or_movie, section=None, smart=False, limit=None, libtype=None, sort=None, filters=None, m3ufilepath=None)
+        createdPlaylist = write_playlist(plex, episode_or_movie)
         
         #If the created playlist was not actually created, Error and exist the script.
         if(not createdPlaylist):
@@ -555,21 +1635,12 @@ def build_playlist(plex, userName, plex_refined_library_sections, selectionsToEx
 
     #For TV Shows Only
     elif (args.allshows == True) and (args.allmovies == False):
-        episode_or_movie = get_random_episodes_or_movies(plex, plex_refined_library_sections, args.number)
-              
-        try:
-            #If a playlist with the same name already exist, delete it
-            if plex.playlist(title=args.name):
-                print(f'The playlist "{args.name}" already exist.')
-                print(f'deleting playlist "{args.name}" ...')
-                plex.playlist(title=args.name).delete()
-
-        except NotFound as e: 
-            logger.debug(f"Playlist {args.name} does not exist to delete.")
+        #Select the playlist items and delete the existing playlist of the same name
+        episode_or_movie = get_playlist_items(plex, plex_refined_library_sections)
             
             
         #Create Playlist, and fill it immediately 
-        createdPlaylist = Playlist.create(server=plex, title=args.name, items=episode_or_movie, section=None, smart=False, limit=None, libtype=None, sort=None, filters=None, m3ufilepath=None)
+        createdPlaylist = write_playlist(plex, episode_or_movie)
         
         #If the created playlist was not actually created, Error and exist the script.
         if(not createdPlaylist):
@@ -606,21 +1677,12 @@ def build_playlist(plex, userName, plex_refined_library_sections, selectionsToEx
            
     #For Movies Only      
     elif (args.allshows == False) and (args.allmovies == True):
-        episode_or_movie = get_random_episodes_or_movies(plex, plex_refined_library_sections, args.number)
-        
-        try:
-            #If a playlist with the same name already exist, delete it
-            if plex.playlist(title=args.name):
-                print(f'The playlist "{args.name}" already exist.')
-                print(f'deleting playlist "{args.name}" ...')
-                plex.playlist(title=args.name).delete()
-
-        except NotFound as e: 
-            logger.debug(f"Playlist {args.name} does not exist to delete.")
+        #Select the playlist items and delete the existing playlist of the same name
+        episode_or_movie = get_playlist_items(plex, plex_refined_library_sections)
             
             
         #Create Playlist, and fill it immediately 
-        createdPlaylist = Playlist.create(server=plex, title=args.name, items=episode_or_movie, section=None, smart=False, limit=None, libtype=None, sort=None, filters=None, m3ufilepath=None)
+        createdPlaylist = write_playlist(plex, episode_or_movie)
         
         #If the created playlist was not actually created, Error and exist the script.
         if(not createdPlaylist):
@@ -665,19 +1727,11 @@ def create_playlist(plex, account):
         getLibrarySection = re.sub(space_remover_regex,',', args.select_library)
         librarySelection_List = (getLibrarySection).split(comma)
 
-    #The name of the library sections type IE (MovieSection, ShowSection, MusicSection, PhotoSection) its used to query the type of data too grab from the plex API
-    getMovieSection = 'MovieSection'
-    getShowSection = 'ShowSection'
-    #These two are only used for exluding sections within the script since they are neither Shows or Movies
-    getMusicSection = 'MusicSection'
-    getPhotoSection = 'PhotoSection'
-
+    #The library sections of this connection, fetched once and shared with build_playlist and get_random_episodes_or_movies
+    catalog = get_section_catalog(plex)
 
-    allSections_List = list()
-    #Loop through each plex library section and return the title and append it to a list of library section names
-    for section in plex.library.sections():
-        #get the title element from the library section
-        allSections_List.append(section.title)
+    #The titles of every plex library section
+    allSections_List = catalog.titles()
     
     #for the section in allSections (converted to String):
     allShowSections_String = str()
@@ -711,14 +1765,6 @@ def create_playlist(plex, account):
         selectionsToExcludeBasedOnWhatUserSelected_List = selectionsToExclude_List
     
     
-    #use to query and find show sections from the for command if statement
-    getShowSectionSearcher = '<' + getShowSection + colon
-    getMovieSectionSearcher = '<' + getMovieSection + colon
-    
-    #Use to Avoid Music or Photo section content
-    getMusicSectionSearcher = '<' + getMusicSection + colon
-    getPhotoSectionSearcher = '<' + getPhotoSection + colon
-    
     #Used to determine if a comma should be placed between the string concatination
     countShows = 0
     countMovies = 0
@@ -734,59 +1780,41 @@ def create_playlist(plex, account):
     
     
     #Build the Full Library Sections for TV Shows and also Movies
-    for section in plex.library.sections():
+    for section in catalog.sections:
         #Grab the List of all possible Shows sections
-        if getShowSectionSearcher in str(section):
+        if section.type == SHOW_SECTION_TYPE:
             allShowSectionsFull_List.append(section.title)
             #if(args.allshows == True):
             if(args.select_library == None):
                 plex_all_tv_and_movie_library_sections_minus_exluded.append(section.title)
 
         #Grab the List of all possible Movies sections
-        elif getMovieSectionSearcher in str(section):
+        elif section.type == MOVIE_SECTION_TYPE:
             allMovieSectionsFull_List.append(section.title)
             
             if(args.select_library == None):
                 plex_all_tv_and_movie_library_sections_minus_exluded.append(section.title)
             
         #Grab the List of all possible Music sections
-        elif getMusicSectionSearcher in str(section):
+        elif section.type == MUSIC_SECTION_TYPE:
             allMusicSectionsFull_List.append(section.title)
+            logger.debug(f'\nThis script does not currently support the library section type \"{section.type}\" for section \"{section.title}\".\n')
             
         #Grab the List of all possible Photos sections
-        elif getPhotoSectionSearcher in str(section):
+        elif section.type == PHOTO_SECTION_TYPE:
             allPhotoSectionsFull_List.append(section.title)
+            logger.debug(f'\nThis script does not currently support the library section type \"{section.type}\" for section \"{section.title}\".\n')
             
         else:
             print(f'\n\"{section}\" is NOT a result of the 4 possible Sections (MovieSection, ShowSection, MusicSection, PhotoSection)!\n')
             logger.warning(f'\nIf a new Plex Library Section Type was added, this script may need to be updated!\n')
+            print(f'\nError - Unknown section type for section \"{section.title}\".\n')
+            exit(1)
             
     
-    #Holds the Formatted Array for both All Movies and Shows only 
-    allSections_Formatted_List = list()
-    movieSections_Formatted_List = list()
-    tvShowsSections_formatted_List = list()
-    
-    get_library_sections = plex.library.sections()
-    
     #Formatted to only contain the Names of the library sections
-    for getSection_data in get_library_sections:        
-        if getShowSectionSearcher in str(getSection_data):
-            tvShowsSections_formatted_List.append(getSection_data.title)
-            
-        elif getMovieSectionSearcher in str(getSection_data):
-            movieSections_Formatted_List.append(getSection_data.title)
-            
-        elif getMusicSectionSearcher in str(getSection_data):
-            logger.debug(f'\nThis script does not currently support the library section type \"{getMusicSection}\" for section \"{getSection_data.title}\".\n')
-            
-        elif getPhotoSectionSearcher in str(getSection_data):
-            logger.debug(f'\nThis script does not currently support the library section type \"{getPhotoSection}\" for section \"{getSection_data.title}\".\n')
-            
-        else:
-            print(f'\nError - Unknown section type for section \"{getSection_data.title}\".\n')
-            exit(1)
-            
+    tvShowsSections_formatted_List = catalog.titles(SHOW_SECTION_TYPE)
+    movieSections_Formatted_List = catalog.titles(MOVIE_SECTION_TYPE)
 
     logger.debug(f'tvShowsSections_formatted_List = {tvShowsSections_formatted_List}')
     logger.debug(f'movieSections_Formatted_List = {movieSections_Formatted_List}')
@@ -914,13 +1942,227 @@ def create_playlist(plex, account):
 
     
 
-def fetch_plex_api(path='', method='GET', plextv=False, **kwargs):
-    """Fetches data from the Plex API"""
+class RateLimiter:
+    """Token bucket shared by every request sent to one host
+
+    Requests go out at up to --max-request-rate per second, or as fast as they come without it. When the host pushes back
+    with a 429/503 response the rate is halved (an unlimited host drops to RATE_LIMIT_BACKOFF_RATE) and no request is sent
+    until its Retry-After has passed, each successful response then recovers the rate.
+    """
+
+    def __init__(self, rate):
+        #None is no limit
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = rate or 0
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Waits until a request may be sent to the host"""
+        with self.lock:
+            now = time.monotonic()
+            wait = self.blocked_until - now
+            if self.rate is not None:
+                self.tokens = min(self.max_rate or self.rate, self.tokens + (now - self.updated) * self.rate)
+                #Reserve the token now, so concurrent requests queue up behind each other
+                self.tokens -= 1
+                wait = max(wait, -self.tokens / self.rate)
+            self.updated = now
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def backoff(self, retry_after):
+        """Slows down after the host pushed back, sending nothing for retry_after seconds"""
+        with self.lock:
+            if self.rate is None:
+                self.rate = RATE_LIMIT_BACKOFF_RATE
+                self.tokens = 0
+            else:
+                self.rate = max(RATE_LIMIT_MIN_RATE, self.rate / 2)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def recover(self):
+        """Speeds up again after a successful request"""
+        with self.lock:
+            if self.rate is None:
+                return
+            if self.max_rate is None:
+                self.rate += RATE_LIMIT_RECOVERY
+                if self.rate >= RATE_LIMIT_UNCAPPED_RATE:
+                    self.rate = None
+            else:
+                self.rate = min(self.max_rate, self.rate + RATE_LIMIT_RECOVERY)
+
+
+#Rate limiters per host (plex.tv and the Plex server), shared by all users and threads
+rate_limiters = dict()
+rate_limiters_lock = threading.Lock()
 
-    url = 'https://plex.tv' if plextv else PLEX_URL.rstrip('/')
 
+def get_rate_limiter(url):
+    """Returns the rate limiter of the host of the url"""
+    host = urlparse(url).netloc
+    with rate_limiters_lock:
+        if host not in rate_limiters:
+            rate_limiters[host] = RateLimiter(args.max_request_rate)
+        return rate_limiters[host]
 
-    headers = {'X-Plex-Token': args.token,
+
+def get_retry_after(response, attempt):
+    """Returns the seconds to wait from the Retry-After header, doubling a one second wait per attempt if it is missing"""
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        if retry_after.isdigit():
+            return int(retry_after)
+        try:
+            return max(0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return 2 ** attempt
+
+
+class RequestFlight:
+    """A GET request in flight, whose response is shared with every identical request sent while it is in flight"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+def get_request_key(url, kwargs):
+    """Returns the key identical requests share: the url, the query parameters and the headers (which hold the token)"""
+    params = kwargs.get('params')
+    params = tuple(sorted(params.items())) if isinstance(params, dict) else params
+    headers = tuple(sorted((kwargs.get('headers') or dict()).items()))
+    return (url, repr(params), headers)
+
+
+def is_random_request(url, kwargs):
+    """Returns True if the request asks for a random sort, whose response must never be reused for a later request"""
+    query = parse_qs(urlparse(url).query)
+    params = kwargs.get('params')
+    sorts = query.get('sort', list()) + ([str(params.get('sort'))] if isinstance(params, dict) and 'sort' in params else list())
+    return any(sort.split(':')[0] == 'random' for sort in sorts)
+
+
+class RateLimitedSession(requests.Session):
+    """requests Session that sends every request through the rate limiter of its host and retries 429/503 responses
+
+    Identical GET requests (same url, parameters, headers and so token) share one response while the first one is in
+    flight (single-flight), and the response is reused for REQUEST_MEMO_SECONDS after that. A response is only kept if no
+    other request (create, update, delete) was sent while it was in flight, as it may have been read before that change.
+    Random sort queries (the movie samples) are shared while in flight but never reused after that.
+    """
+
+    def __init__(self):
+        super().__init__()
+        #GET requests in flight and the recently completed responses, by request key
+        self.flights = dict()
+        self.memo = dict()
+        self.flights_lock = threading.Lock()
+        #Number of requests other than GET sent so far
+        self.write_generation = 0
+
+    def request(self, method, url, *args, **kwargs):
+        if method.upper() != 'GET' or args or kwargs.get('stream'):
+            #The request may change what a GET returns, forget the reused responses
+            with self.flights_lock:
+                self.memo.clear()
+                self.write_generation += 1
+            return self.send_rate_limited(method, url, *args, **kwargs)
+
+        key = get_request_key(url, kwargs)
+        with self.flights_lock:
+            response, completed = self.memo.get(key, (None, 0))
+            if response is not None and time.monotonic() - completed < REQUEST_MEMO_SECONDS:
+                logger.debug(f'SINGLE_FLIGHT: Reusing the response of {urlparse(url).path}')
+                return response
+
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = RequestFlight()
+                write_generation = self.write_generation
+
+        if not leader:
+            logger.debug(f'SINGLE_FLIGHT: Waiting for the identical request of {urlparse(url).path}')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        reusable = not is_random_request(url, kwargs)
+        try:
+            flight.response = self.send_rate_limited(method, url, **kwargs)
+            return flight.response
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.flights_lock:
+                del self.flights[key]
+                now = time.monotonic()
+                for expired in [memo_key for memo_key, (_, completed) in self.memo.items() if now - completed >= REQUEST_MEMO_SECONDS]:
+                    del self.memo[expired]
+                if flight.response is not None and flight.response.ok and reusable and write_generation == self.write_generation:
+                    self.memo[key] = (flight.response, now)
+            flight.done.set()
+
+    def send_rate_limited(self, method, url, *args, **kwargs):
+        rate_limiter = get_rate_limiter(url)
+
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            rate_limiter.acquire()
+            response = super().request(method, url, *args, **kwargs)
+
+            if response.status_code not in RATE_LIMIT_STATUS_CODES:
+                rate_limiter.recover()
+                return response
+            if attempt == RATE_LIMIT_RETRIES:
+                return response
+
+            retry_after = get_retry_after(response, attempt)
+            rate_limiter.backoff(retry_after)
+            if method.upper() not in RATE_LIMIT_RETRY_METHODS:
+                logger.debug(f'RATE_LIMIT: {urlparse(url).netloc} answered {response.status_code} to a {method.upper()}, not retrying it')
+                return response
+            logger.debug(f'RATE_LIMIT: {urlparse(url).netloc} answered {response.status_code}, retrying in {retry_after:.1f}s')
+
+
+#The HTTP session used for every request to plex.tv and the Plex server
+http_session = None
+
+
+def get_http_session():
+    """Returns the HTTP session shared by every connection, creating it on first use
+
+    The session keeps its connections to plex.tv and the Plex server alive (one pool per host, sized for --workers),
+    asks for gzip responses and retries failed connections and server errors --http-retries times.
+    """
+    global http_session
+    if http_session is None:
+        http_session = RateLimitedSession()
+        http_session.headers['Accept-Encoding'] = 'gzip'
+
+        retries = Retry(total=args.http_retries, backoff_factor=0.5, status_forcelist=HTTP_RETRY_STATUS_CODES,
+                        raise_on_status=False, respect_retry_after_header=False)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, args.workers * 2), max_retries=retries)
+        http_session.mount('https://', adapter)
+        http_session.mount('http://', adapter)
+    return http_session
+
+
+def fetch_plex_api(path='', method='GET', plextv=False, token=None, **kwargs):
+    """Fetches data from the Plex API, with the --token unless another token is provided"""
+
+    url = 'https://plex.tv' if plextv else args.baseurl.rstrip('/')
+
+
+    headers = {'X-Plex-Token': token or args.token,
                'Accept': 'application/json'}
 
     params = {}
@@ -929,17 +2171,17 @@ def fetch_plex_api(path='', method='GET', plextv=False, **kwargs):
 
     try:
         if method.upper() == 'GET':
-            r = requests.get(url + path,
-                             headers=headers, params=params, verify=False)
+            r = get_http_session().get(url + path,
+                                       headers=headers, params=params, verify=False)
         elif method.upper() == 'POST':
-            r = requests.post(url + path,
-                              headers=headers, params=params, verify=False)
+            r = get_http_session().post(url + path,
+                                        headers=headers, params=params, verify=False)
         elif method.upper() == 'PUT':
-            r = requests.put(url + path,
-                             headers=headers, params=params, verify=False)
+            r = get_http_session().put(url + path,
+                                       headers=headers, params=params, verify=False)
         elif method.upper() == 'DELETE':
-            r = requests.delete(url + path,
-                                headers=headers, params=params, verify=False)
+            r = get_http_session().delete(url + path,
+                                          headers=headers, params=params, verify=False)
         else:
             print("Invalid request method provided: {method}".format(method=method))
             return
@@ -958,37 +2200,334 @@ def fetch_plex_api(path='', method='GET', plextv=False, **kwargs):
         print("Error fetching from Plex API: {err}".format(err=e))
 
 
-def get_user_tokens(server_id):
-    api_users = fetch_plex_api('/api/users', plextv=True)
+#plex.tv listings already fetched during this run, by request path
+plextv_listings = dict()
+plextv_listings_lock = threading.Lock()
+
+
+def fetch_plextv_listing(path, token=None):
+    """Fetches a plex.tv listing only once per run"""
+    with plextv_listings_lock:
+        if (path, token) not in plextv_listings:
+            plextv_listings[(path, token)] = fetch_plex_api(path, plextv=True, token=token)
+        return plextv_listings[(path, token)]
+
+
+def listing_elements(listing, tag):
+    """Returns the elements of the tag in a plex.tv listing as a list (xmltodict returns a lone element as a dict)"""
+    elements = ((listing or dict()).get('MediaContainer') or dict()).get(tag) or list()
+    return [elements] if isinstance(elements, dict) else elements
 
-    api_shared_servers = fetch_plex_api('/api/servers/{server_id}/shared_servers'.format(server_id=server_id), plextv=True)
-    user_ids = {user['@id']: user.get('@username', user.get('@title')) for user in api_users['MediaContainer']['User']}
-    users = {user_ids[user['@userID']]: user['@accessToken'] for user in api_shared_servers['MediaContainer']['SharedServer']}
+
+def get_user_tokens(server_id, token=None):
+    api_users = fetch_plextv_listing('/api/users', token)
+
+    api_shared_servers = fetch_plextv_listing('/api/servers/{server_id}/shared_servers'.format(server_id=server_id), token)
+    #Users are named by their title like MyPlexAccount.users() (and --homeusers), the username is empty for managed users
+    user_ids = {user['@id']: user.get('@title') or user.get('@username') for user in listing_elements(api_users, 'User')}
+    users = {user_ids[user['@userID']]: user['@accessToken'] for user in listing_elements(api_shared_servers, 'SharedServer')
+             if user['@userID'] in user_ids}
  
     #Return the Profile Name
     return users
     
 def get_user_id(server_id):
-    api_users = fetch_plex_api('/api/users', plextv=True)
+    api_users = fetch_plextv_listing('/api/users')
 
-    api_shared_servers = fetch_plex_api('/api/servers/{server_id}/shared_servers'.format(server_id=server_id), plextv=True)
-    user_ids = {user['@id']: user.get('@username', user.get('@title')) for user in api_users['MediaContainer']['User']}
-    users = {user_ids[user['@userID']]: user['@accessToken'] for user in api_shared_servers['MediaContainer']['SharedServer']}
+    user_ids = {user['@id']: user.get('@title') or user.get('@username') for user in listing_elements(api_users, 'User')}
  
     #Return the ids
     return user_ids
 
 
+class UserOutputBuffer:
+    """Replaces sys.stdout while home users are processed so each user's output is printed as one block
+
+    Every worker thread writes into its own buffer between begin() and end(), anything else goes straight to the terminal.
+    The buffer is a context variable, so the --async calls a worker starts (run_concurrently) write into it as well.
+    """
+
+    def __init__(self):
+        self.stream = sys.stdout
+        self.buffer = contextvars.ContextVar('output_buffer', default=None)
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        sys.stdout = self
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.stdout = self.stream
+
+    def begin(self):
+        self.buffer.set(io.StringIO())
+
+    def end(self):
+        output = self.buffer.get().getvalue()
+        self.buffer.set(None)
+        with self.lock:
+            self.stream.write(output)
+            self.stream.flush()
+
+    def write(self, text):
+        buffer = self.buffer.get()
+        if buffer is None:
+            return self.stream.write(text)
+        return buffer.write(text)
+
+    def flush(self):
+        if self.buffer.get() is None:
+            self.stream.flush()
+
+
+#The plex.tv account and home users of each admin connection, fetched once per run
+plex_accounts = dict()
+plex_home_users = dict()
+plex_account_lock = threading.Lock()
+
+
+def get_plex_account(plex):
+    """Returns the plex.tv account of the connection, fetched on first use"""
+    connection_key = (plex._baseurl, plex._token)
+    with plex_account_lock:
+        if connection_key not in plex_accounts:
+            plex_accounts[connection_key] = plex.myPlexAccount()
+        return plex_accounts[connection_key]
+
+
+def get_plex_home_users(plex):
+    """Returns the home users (and friends) of the account of the connection by title, fetched on first use"""
+    account = get_plex_account(plex)
+    with plex_account_lock:
+        if account.uuid not in plex_home_users:
+            plex_home_users[account.uuid] = {plex_user.title: plex_user for plex_user in account.users()}
+        return plex_home_users[account.uuid]
+
+
+class HomeUserTokenCache:
+    """Server tokens of the home users by (machineIdentifier, admin account uuid, home user), kept for --home-token-ttl seconds
+
+    The tokens are stored on disk (readable by the owner only) when --cache-dir is used, so later runs do not have to
+    switch to every home user again.
+    """
+
+    def __init__(self, cache_dir=None):
+        #(machine_id, account_uuid, home_user) -> (token, expires_at)
+        self.tokens = dict()
+        self.db = None
+        self.lock = threading.Lock()
+
+        if cache_dir != None:
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, 'home_user_tokens.sqlite')
+            #Create the file readable by the owner only before sqlite opens it, and fix the mode of an older file
+            os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+            os.chmod(path, 0o600)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS tokens (machine_id TEXT, account_uuid TEXT, home_user TEXT, '
+                            'token TEXT, expires_at REAL, PRIMARY KEY (machine_id, account_uuid, home_user))')
+            for machine_id, account_uuid, home_user, token, expires_at in self.db.execute('SELECT * FROM tokens'):
+                self.tokens[(machine_id, account_uuid, home_user)] = (token, expires_at)
+
+    def get(self, key):
+        """Returns the cached token of the home user, or None if there is none or it expired"""
+        with self.lock:
+            token, expires_at = self.tokens.get(key, (None, None))
+            if expires_at is None or time.time() > expires_at:
+                return None
+            return token
+
+    def set(self, key, token):
+        """Stores the token of the home user (None forgets it), never on disk with a --home-token-ttl of 0"""
+        expires_at = time.time() + args.home_token_ttl
+        with self.lock:
+            if token is None:
+                self.tokens.pop(key, None)
+            else:
+                self.tokens[key] = (token, expires_at)
+            if self.db is not None:
+                with self.db:
+                    if token is None or args.home_token_ttl == 0:
+                        self.db.execute('DELETE FROM tokens WHERE machine_id = ? AND account_uuid = ? AND home_user = ?', key)
+                    else:
+                        self.db.execute('INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?, ?)', key + (token, expires_at))
+
+
+#The home user token cache of the run
+home_user_token_cache = None
+
+
+def get_home_user_token_cache():
+    """Returns the home user token cache of the run, loading it on first use"""
+    global home_user_token_cache
+    with plex_account_lock:
+        if home_user_token_cache is None:
+            home_user_token_cache = HomeUserTokenCache(args.cache_dir)
+        return home_user_token_cache
+
+
+def get_home_user_token_map(plex):
+    """Returns the server token of every user the server of plex is shared with by name, from two plex.tv listings (--token-map)"""
+    return get_user_tokens(plex.machineIdentifier, get_plex_account(plex).authenticationToken)
+
+
+def is_restricted_user(plex_user):
+    """Returns True if the home user (a MyPlexUser, None if unknown) may not see every item of the libraries"""
+    if plex_user is None:
+        return True
+    return plex_user.restricted in ('1', 'true', True) or bool(plex_user.filterAll or plex_user.filterMovies or plex_user.filterTelevision)
+
+
+#Connections (base url and token) of the home users with content restrictions, whose snapshot candidates are filtered
+restricted_connections = set()
+
+
+def connect_home_user(plex, homeUser):
+    """Returns a connection to the server of plex as the home user
+
+    The address plex already connected with is reused, so the connections of the resource are not probed again
+    for every user. The server token of the home user is only fetched (by switching to the user) when it is not cached.
+    """
+    userServer = None
+    if args.token_map is True:
+        #The server tokens of every user were fetched in one bulk step, the user is connected without plex.tv
+        token = get_home_user_token_map(plex).get(homeUser)
+        if token is not None:
+            userServer = PlexServer(plex._baseurl, token, session=get_http_session())
+        else:
+            logger.info(f'{homeUser} has no shared server token, switching to the user')
+
+    if userServer is None:
+        key = (plex.machineIdentifier, get_plex_account(plex).uuid, homeUser)
+        token = get_home_user_token_cache().get(key)
+        if token is not None:
+            try:
+                userServer = PlexServer(plex._baseurl, token, session=get_http_session())
+            except Unauthorized:
+                logger.debug(f'Cached token of {homeUser} was rejected, switching to the user again')
+
+    if userServer is None:
+        userAccount = get_plex_account(plex).switchHomeUser(user=get_plex_home_users(plex).get(homeUser, homeUser), pin=None)
+        token = userAccount.resource(args.resource).accessToken
+        get_home_user_token_cache().set(key, token)
+        userServer = PlexServer(plex._baseurl, token, session=get_http_session())
+
+    if is_restricted_user(get_plex_home_users(plex).get(homeUser)):
+        restricted_connections.add((userServer._baseurl, userServer._token))
+    return userServer
+
+
+def generate_home_user_playlist(plex, homeUser, output):
+    """Switches to the home user and creates (or purges with --purge) their playlist
+
+    Returns True on success, None if the user could not be used and False if the playlist generation failed.
+    """
+    output.begin()
+    options = args.begin_copy()
+    try:
+        logger.debug('\nChecking if the user is a Plex Home guest...\n')
+        logger.debug(f'Switching to user: [{homeUser}] ...\n')
+
+        print(f'\n-----------[BEGIN]-------------- {homeUser} -------------[BEGIN]--------------')
+
+        runningAsUser = connect_home_user(plex, homeUser)
+
+        print(f'\nCurrent User [Home User]: {homeUser}\n')
+
+        #If the --purge argument was passed in then delete the playlist if it exist
+        if(args.purge == True):
+            delete_playlist(runningAsUser, homeUser, args.name)
+        else:
+            print(f'Creating playlist \"{args.name}\" ...')
+            create_playlist(runningAsUser, homeUser)
+            print(f'\nPlaylist creation for user [{homeUser}] - COMPLETED\n')
+        print(f'------------[END]------------- {homeUser} --------------[END]-------------')
+        return True
+
+    except Unauthorized:
+        print(f'User \"{homeUser}\" is Unauthorized to access the Plex Home \"{args.resource}\"')
+
+    except NotFound:
+        print(f'User \"{homeUser}\" is not in the Plex Home \"{args.resource}\"')
+
+    #A failure for one user should not stop the playlists of the other users from being generated
+    except BadRequest as e:
+        print(f'\nError - BadRequest: {e}\n')
+        return False
+
+    except SystemExit:
+        print(f'\nError - Playlist generation for user [{homeUser}] was aborted.\n')
+        return False
+
+    except Exception as e:
+        print(f'\nError - Playlist generation for user [{homeUser}] failed: {e}\n')
+        return False
+
+    finally:
+        args.end_copy(options)
+        output.end()
+
+
+def generate_home_users_playlists(plex, homeUsers):
+    """Generates the playlist of every home user, processing up to --workers users at the same time
+
+    Returns the number of home users whose playlist was generated (or purged) successfully.
+    """
+    if args.token_map is True and homeUsers:
+        tokens = get_home_user_token_map(plex)
+        logger.debug(f'Fetched the server tokens of {len(tokens)} users')
+
+    with UserOutputBuffer() as output:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(lambda homeUser: generate_home_user_playlist(plex, homeUser, output), homeUsers))
+
+    failedHomeUsers = [homeUser for homeUser, result in zip(homeUsers, results) if result is False]
+    if failedHomeUsers:
+        print(f'\nError - Playlist generation failed for the Home Users: {failedHomeUsers}\n')
+        exit(1)
+
+    return results.count(True)
+
+
+#The admin connections of the server and account methods, shared by every job of the run (--jobs)
+server_connections = dict()
+account_connections = dict()
+
+
+def get_server_connection(base_url, authToken):
+    """Returns the connection to the server with the token, connecting on first use"""
+    if (base_url, authToken) not in server_connections:
+        server_connections[(base_url, authToken)] = PlexServer(baseurl=base_url, token=authToken, session=get_http_session())
+    return server_connections[(base_url, authToken)]
+
+
+def get_account_connection():
+    """Returns the plex.tv account of --username and its connection to --resource, logging in on first use"""
+    if (args.username, args.resource) not in account_connections:
+        account = MyPlexAccount(args.username, args.password, session=get_http_session())
+        account_connections[(args.username, args.resource)] = (account, account.resource(args.resource).connect())
+    return account_connections[(args.username, args.resource)]
+
+
 #Generate the users playlist for Server Method
 def generate_all_users_playlist_via_server_method(base_url, authToken, homeUsers=None):
 
     try:
-        plex_server = PlexServer(baseurl=base_url, token=authToken, session=None)
+        plex_server = get_server_connection(base_url, authToken)
         logger.debug('\nGetting Library Sections...\n')
         
-        plex_library_sections = plex_server.library.sections()
+        plex_library_sections = get_section_catalog(plex_server).sections
         logger.debug(f'Plex Sections: {plex_library_sections}\n')
 
+        #Fetch the library metadata once with the admin connection (or from the metadata cache) and share it with every user
+        global library_snapshot, metadata_cache
+        if((args.shared_snapshot == True) or (args.cache_dir != None)) and (args.purge == False):
+            if(args.cache_dir != None) and (metadata_cache == None):
+                metadata_cache = MetadataCache(args.cache_dir)
+            library_snapshot = get_library_snapshot(plex_server)
+        else:
+            library_snapshot = None
+
     except Unauthorized:
         print(f'The Server details could not be authenticated.')
         exit(1)
@@ -1001,7 +2540,7 @@ def generate_all_users_playlist_via_server_method(base_url, authToken, homeUsers
         try:
             #list of All plex users
             allHomeUsers = list()
-            get_plex_users = plex_server.myPlexAccount().users()
+            get_plex_users = get_plex_home_users(plex_server).values()
             
             print('Retrieving All Home Users ...\n')
             
@@ -1042,7 +2581,7 @@ def generate_all_users_playlist_via_server_method(base_url, authToken, homeUsers
             print('\nChecking if the user is the Plex Home Admin...')
             
             #If the account is the Plex Home admin (True if it is, false if not).
-            isHomeAdmin = plex_server.myPlexAccount().homeAdmin
+            isHomeAdmin = get_plex_account(plex_server).homeAdmin
             
             if (isHomeAdmin == True):
                 print('\nThis is indeed the Home Admin\n')
@@ -1050,7 +2589,7 @@ def generate_all_users_playlist_via_server_method(base_url, authToken, homeUsers
                 print('\nThis is NOT the Home Admin!\nExiting...\n')
                 exit(1)
 
-            adminUser = plex_server.myPlexAccount()
+            adminUser = get_plex_account(plex_server)
             #Get the Admin User Account Name
             adminUsername = adminUser.title
 
@@ -1079,88 +2618,14 @@ def generate_all_users_playlist_via_server_method(base_url, authToken, homeUsers
     
     if setAllHomeUsers == True:
         print('\n###Obtaining Home Users [ALL USERS]###\n\n')
-        for plex_user in allHomeUsers:
-            try:
-                logger.debug('\nChecking if the current user is a Plex Home guest...\n')
-                logger.debug(f'Switching to user: [{plex_user}] ...\n')
-                
-                print(f'\n-----------[BEGIN]-------------- {plex_user} -------------[BEGIN]--------------')         
-                
-                runningAsUser = plex_server.myPlexAccount().switchHomeUser(user=plex_user, pin=None).resource(args.resource).connect()
-                
-                print(f'\nCurrent User [Home User]: {plex_user}\n')
-
-                #If the --purge argument was passed in then delete the playlist if it exist
-                if(args.purge == True):
-                    delete_playlist(runningAsUser, plex_user, args.name)
-                else:
-                    print(f'Creating playlist \"{args.name}\" ...')
-                    create_playlist(runningAsUser, plex_user) 
-                    print(f'\nPlaylist creation for user [{plex_user}] - COMPLETED\n')
-                print(f'------------[END]------------- {plex_user} --------------[END]-------------')
-                    
-                if(args.purge != None):
-                    time.sleep(5)
-                                            
-            except Unauthorized:
-                print(f'User \"{plex_user}\" is Unauthorized to access the Plex Home \"{args.resource}\"')
-
-            except NotFound:
-                print(f'User \"{plex_user}\" is not in the Plex Home \"{args.resource}\"')
-                
-            except BadRequest as e:
-                print(f'\nError - BadRequest: {e}\n')
-                exit(1)
+        generate_home_users_playlists(plex_server, allHomeUsers)
                 
     else:
+        #Only the entered users that are actual Home Users are processed
+        validHomeUsers = [homeUser for homeUser in homeUsers if homeUser in allHomeUsers]
+
         #Used to count the number of valid Home Users entered by the user.
-        numberValidHomeUsersEntered = 0
-        
-        for homeUser in homeUsers:
-            if homeUser in allHomeUsers:
-                try:
-                    #if plex_user in homeUsers: 
-                    logger.debug('\nChecking if the user is a Plex Home guest...\n')
-                    logger.debug(f'\nHome User [matched]: {homeUser}\n')      
-                    logger.debug(f'Switching to user: [{homeUser}] ...\n')
-                    
-                    print(f'-----------[BEGIN]-------------- {homeUser} -------------[BEGIN]--------------')
-                                   
-                    runningAsUser = plex_server.myPlexAccount().switchHomeUser(user=homeUser, pin=None).resource(args.resource).connect()
-                    
-                    print(f'\nCurrent User: {homeUser}\n')
-
-                    #If the --purge argument was passed in then delete the playlist if it exist
-                    if(args.purge == True):
-                        delete_playlist(runningAsUser, homeUser, args.name)
-                        
-                        #Increment the valid entered user count
-                        numberValidHomeUsersEntered += 1
-                    else:
-                        print(f'Creating playlist \"{args.name}\" ...')
-                        create_playlist(runningAsUser, homeUser)
-                        print(f'\nPlaylist creation for user [{homeUser}] - COMPLETED\n')
-                        
-                        #Increment the valid entered user count
-                        numberValidHomeUsersEntered += 1
-                    print(f'------------[END]------------- {homeUser} --------------[END]-------------')  
-                    
-                    if(args.purge != None):
-                        time.sleep(5)
-                        
-                                            
-                except Unauthorized:
-                    print(f'User \"{homeUser}\" is Unauthorized to access the Plex Home \"{args.resource}\"')
-
-                except NotFound:
-                    print(f'User \"{homeUser}\" is not in the Plex Home \"{args.resource}\"')
-                    
-                except BadRequest as e:
-                    print(f'\nError - BadRequest: {e}\n')
-                    exit(1)
-                    
-            else:
-                continue
+        numberValidHomeUsersEntered = generate_home_users_playlists(plex_server, validHomeUsers)
                 
         #If none of the users entered by the user are valid
         if((args.homeusers != None) and (numberValidHomeUsersEntered <= 0)):
@@ -1170,10 +2635,22 @@ def generate_all_users_playlist_via_server_method(base_url, authToken, homeUsers
 
 def generate_all_users_playlist_via_account_method(plexConnection, accountInfo, homeUsers):
 
+    #The account used to log in is the account of the connection, it does not have to be fetched again
+    plex_accounts[(plexConnection._baseurl, plexConnection._token)] = accountInfo
+
     try:
-        plex_library_sections = plexConnection.library.sections()
+        plex_library_sections = get_section_catalog(plexConnection).sections
         logger.debug(f'Plex Sections: {plex_library_sections}\n')
 
+        #Fetch the library metadata once with the admin connection (or from the metadata cache) and share it with every user
+        global library_snapshot, metadata_cache
+        if((args.shared_snapshot == True) or (args.cache_dir != None)) and (args.purge == False):
+            if(args.cache_dir != None) and (metadata_cache == None):
+                metadata_cache = MetadataCache(args.cache_dir)
+            library_snapshot = get_library_snapshot(plexConnection)
+        else:
+            library_snapshot = None
+
     except Unauthorized:
         print(f'The Server details could not be authenticated.')
         exit(1)
@@ -1186,7 +2663,7 @@ def generate_all_users_playlist_via_account_method(plexConnection, accountInfo,
         try:           
             #list of All plex users
             allHomeUsers = list()
-            get_plex_users = plexConnection.myPlexAccount().users()
+            get_plex_users = get_plex_home_users(plexConnection).values()
             
             print('Retrieving All Home Users ...\n')
             
@@ -1226,7 +2703,7 @@ def generate_all_users_playlist_via_account_method(plexConnection, accountInfo,
             print('\nChecking if the user is the Plex Home Admin...')
             
             #If the account is the Plex Home admin (True if it is, false if not).
-            isHomeAdmin = plexConnection.myPlexAccount().homeAdmin
+            isHomeAdmin = get_plex_account(plexConnection).homeAdmin
             
             if (isHomeAdmin == True):
                 print('\nThis is indeed the Home Admin\n')
@@ -1234,7 +2711,7 @@ def generate_all_users_playlist_via_account_method(plexConnection, accountInfo,
                 print('\nThis is NOT the Home Admin!\nExiting...\n')
                 exit(1)
 
-            adminUser = plexConnection.myPlexAccount()
+            adminUser = get_plex_account(plexConnection)
             #Get the Admin User Account Name
             adminUsername = adminUser.title
 
@@ -1265,87 +2742,14 @@ def generate_all_users_playlist_via_account_method(plexConnection, accountInfo,
     #If the user passed in the word "all" as a home user the script will run for every home user profile
     if setAllHomeUsers == True:
         print('\n###Obtaining Home Users [ALL USERS]###\n\n')
-        for plex_user in allHomeUsers:
-            try:
-                logger.debug('\nChecking if the current user is a Plex Home guest...\n')
-                logger.debug(f'Switching to user: [{plex_user}] ...\n')
-                
-                print(f'\n-----------[BEGIN]-------------- {plex_user} -------------[BEGIN]--------------')         
-                
-                runningAsUser = plexConnection.myPlexAccount().switchHomeUser(user=plex_user, pin=None).resource(args.resource).connect()
-                
-                print(f'\nCurrent User [Home User]: {plex_user}\n\n')
-
-                #If the --purge argument was passed in then delete the playlist if it exist
-                if(args.purge == True):
-                    delete_playlist(runningAsUser, plex_user, args.name)
-                else:
-                    print(f'Creating playlist \"{args.name}\" ...')
-                    create_playlist(runningAsUser, plex_user) 
-                    print(f'\nPlaylist creation for user [{plex_user}] - COMPLETED\n')
-                print(f'------------[END]------------- {plex_user} --------------[END]-------------')
-                    
-                if(args.purge != None):
-                    time.sleep(5)
-                    
-            except Unauthorized:
-                print(f'User \"{plex_user}\" is Unauthorized to access the Plex Home \"{args.resource}\"')
-
-            except NotFound:
-                print(f'User \"{plex_user}\" is not in the Plex Home \"{args.resource}\"')
-                
-            except BadRequest as e:
-                print(f'\nError - BadRequest: {e}\n')
-                exit(1)
+        generate_home_users_playlists(plexConnection, allHomeUsers)
                 
     else:
-        #Used to count the number of valid Home Users entered by the user.
-        numberValidHomeUsersEntered = 0
-        
-        for homeUser in homeUsers:        
-            if homeUser in allHomeUsers:
-                try:
-                    #if plex_user in homeUsers: 
-                    logger.debug('\nChecking if the user is a Plex Home guest...\n')
-                    logger.debug(f'\nHome User [matched]: {homeUser}\n')    
-                    logger.debug(f'Switching to user: [{homeUser}] ...\n')
-                    
-                    print(f'-----------[BEGIN]-------------- {homeUser} -------------[BEGIN]--------------')
-                                   
-                    runningAsUser = plexConnection.myPlexAccount().switchHomeUser(user=homeUser, pin=None).resource(args.resource).connect()
-                    
-                    print(f'\nCurrent User: {homeUser}\n')
+        #Only the entered users that are actual Home Users are processed
+        validHomeUsers = [homeUser for homeUser in homeUsers if homeUser in allHomeUsers]
 
-                    #If the --purge argument was passed in then delete the playlist if it exist
-                    if(args.purge == True):
-                        delete_playlist(runningAsUser, homeUser, args.name)
-
-                        #Increment the valid entered user count
-                        numberValidHomeUsersEntered += 1                        
-                    else:
-                        print(f'Creating playlist \"{args.name}\" ...')
-                        create_playlist(runningAsUser, homeUser)
-                        print(f'\nPlaylist creation for user [{homeUser}] - COMPLETED\n')
-                        
-                        #Increment the valid entered user count
-                        numberValidHomeUsersEntered += 1                        
-                    print(f'------------[END]------------- {homeUser} --------------[END]-------------')  
-                    
-                    if(args.purge != None):
-                        time.sleep(5)
-                        
-                except Unauthorized:
-                    print(f'User \"{homeUser}\" is Unauthorized to access the Plex Home \"{args.resource}\"')
-
-                except NotFound:
-                    print(f'User \"{homeUser}\" is not in the Plex Home \"{args.resource}\"')
-                    
-                except BadRequest as e:
-                    print(f'\nError - BadRequest: {e}\n')
-                    exit(1)
-                    
-            else:
-                continue
+        #Used to count the number of valid Home Users entered by the user.
+        numberValidHomeUsersEntered = generate_home_users_playlists(plexConnection, validHomeUsers)
 
         #If none of the users entered by the user are valid
         if((args.homeusers != None) and (numberValidHomeUsersEntered <= 0)):
@@ -1353,9 +2757,9 @@ def generate_all_users_playlist_via_account_method(plexConnection, accountInfo,
             exit(1)
             
 
-def main():
-    global args
-    args = get_args()
+
+def run_playlist_job():
+    """Creates (or purges) the playlist described by args for the selected users"""
     plex = None
 
     #If the user enters the selectLibrary argument
@@ -1365,7 +2769,40 @@ def main():
     elif(args.select_library != None) and (args.allmovies == True):
         print(f'\nERROR - The \"--select-library\" argument cannot be used in conjunction with the \"--allmovies\" argument.\n')
         exit(1)
+
+    if(args.lazy_fetch == True) and (args.bulk_fetch == True):
+        print(f'\nERROR - The \"--lazy-fetch\" argument cannot be used in conjunction with the \"--bulk-fetch\" argument.\n')
+        exit(1)
     
+    #Watched episodes are picked at random and without the missing episode check, set once before any user is generated
+    if(args.include_watched == True) and (args.allmovies != True):
+        if args.randomize is False:
+            logger.warning("Setting --randomized flag, or playlist will always start at Episode 1 for each series")
+            args.randomize = True
+        if args.ignore_skipped is False:
+            logger.warning("Setting --ignore-skipped flag, missing episode check is not compatible with --randomized option flag")
+            args.ignore_skipped = True
+
+    if(args.max_request_rate != None) and (args.max_request_rate <= 0):
+        print(f'\nERROR - The \"--max-request-rate\" argument must be greater than 0.\n')
+        exit(1)
+
+    if(args.async_concurrency < 1):
+        print(f'\nERROR - The \"--async-concurrency\" argument must be greater than 0.\n')
+        exit(1)
+
+    if(args.http_retries < 0):
+        print(f'\nERROR - The \"--http-retries\" argument cannot be negative.\n')
+        exit(1)
+
+    if(args.workers < 1):
+        print(f'\nERROR - The \"--workers\" argument must be greater than 0.\n')
+        exit(1)
+
+    if(args.home_token_ttl < 0):
+        print(f'\nERROR - The \"--home-token-ttl\" argument cannot be negative.\n')
+        exit(1)
+
     #If the user does not provide a user to apply the playlist creation/deletion to, print an Error, and exit.
     if(args.adminuser != True) and (args.homeusers == None):
         print(f'\nERROR - The script requires the use of at least one User.\n\nAvailable options:\n [1] - adminuser (--adminuser) \n [2] - homeusers (--homeusers "Username1,Username2,...")\n')
@@ -1454,8 +2891,7 @@ def main():
             
             try:
                 # ## Connect via Account
-                account = MyPlexAccount(args.username, args.password)
-                plex = account.resource(args.resource).connect()
+                account, plex = get_account_connection()
                 
             except NotFound:
                 print(f'The Resource \"{args.resource}\" could not be found.')
@@ -1507,7 +2943,103 @@ def main():
     else:
         print(f'\nError - \"args.number\" must be greater than 0.\n')
         exit(1)
-        
+
+
+def load_jobs(path, options):
+    """Returns the playlist jobs of the JSON (or YAML, with PyYAML installed) jobs file, each as the options of one run
+
+    The file holds a list of jobs (or {"jobs": [...]}). Each job sets options by their long name (I.E. "name",
+    "select-library", "number", "homeusers"), every other option keeps the value given on the command line. Flags take
+    true or false and lists are joined with commas. --shared-snapshot is on for every job that does not turn it off.
+    """
+    try:
+        with open(path) as jobs_file:
+            if path.lower().endswith(('.yaml', '.yml')):
+                try:
+                    import yaml
+                except ImportError:
+                    print(f'\nERROR - Reading the YAML jobs file \"{path}\" requires PyYAML (pip install pyyaml).\n')
+                    exit(1)
+                jobs = yaml.safe_load(jobs_file)
+            else:
+                jobs = json.load(jobs_file)
+    except (OSError, ValueError) as e:
+        print(f'\nERROR - The jobs file \"{path}\" could not be read: {e}\n')
+        exit(1)
+
+    if isinstance(jobs, dict):
+        jobs = jobs.get('jobs')
+    if not isinstance(jobs, list) or not all(isinstance(job, dict) for job in jobs):
+        print(f'\nERROR - The jobs file \"{path}\" must hold a list of jobs.\n')
+        exit(1)
+
+    #Each job is parsed like a command line so its options get the same names, types, choices and checks
+    parser = get_parser()
+    jobOptions = list()
+    for job in jobs:
+        jobArgs = argparse.Namespace(**vars(options))
+        #The jobs share the library fetches of one snapshot, a job opts out with "shared-snapshot": false
+        jobArgs.shared_snapshot = True
+        argv = list()
+        for option, value in job.items():
+            option_string = '--' + str(option).lstrip('-')
+            action = parser.option_actions.get(option_string)
+            if action is None or option_string in ('--jobs', '--help'):
+                print(f'\nERROR - Unknown option \"{option}\" in the jobs file \"{path}\".\n')
+                exit(1)
+
+            if action.nargs == 0:
+                if not isinstance(value, bool):
+                    print(f'\nERROR - The option \"{option}\" in the jobs file \"{path}\" must be true or false.\n')
+                    exit(1)
+                if value is True:
+                    argv.append(option_string)
+                else:
+                    #false is the same as leaving the flag out of the command line
+                    setattr(jobArgs, action.dest, action.default)
+            elif isinstance(value, list):
+                argv.extend([option_string, ','.join(str(item) for item in value)])
+            else:
+                argv.extend([option_string, str(value)])
+
+        jobOptions.append(parser.parse_args(argv, namespace=jobArgs))
+    return jobOptions
+
+
+def run_jobs(options):
+    """Runs every playlist job of the --jobs file in this process
+
+    The login, the connections, the section catalogs, the library snapshot and the playlist indexes are shared by
+    all jobs, so each job only costs its selection and playlist writes. A failing job does not stop the others.
+    """
+    failedJobs = list()
+    jobOptions = load_jobs(options.jobs, options)
+
+    for number, jobArgs in enumerate(jobOptions, start=1):
+        args.use_options(jobArgs)
+        print(f'\n==========[JOB {number}/{len(jobOptions)}]========== {args.name} ==========[JOB {number}/{len(jobOptions)}]==========')
+        try:
+            run_playlist_job()
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                failedJobs.append(args.name)
+        except Exception as e:
+            print(f'\nError - Job \"{args.name}\" failed: {e}\n')
+            failedJobs.append(args.name)
+
+    if failedJobs:
+        print(f'\nError - The following jobs failed: {failedJobs}\n')
+        exit(1)
+
+
+def main():
+    options = get_args()
+    args.use_options(options)
+
+    if(args.jobs != None):
+        run_jobs(options)
+    else:
+        run_playlist_job()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,772 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import stat
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+from xml.etree import ElementTree
+
+import pytest
+import xmltodict
+
+import plex_playlist_generator as generator
+
+
+def episode(ratingKey, season, index, title=None):
+    return generator.MediaRecord((ratingKey, 'episode', None, title or f'Episode {ratingKey}', None, None,
+                                  season, index, None, None))
+
+
+def movie(ratingKey, title=None):
+    return generator.MediaRecord((ratingKey, 'movie', None, title or f'Movie {ratingKey}', None, None,
+                                  None, None, None, None))
+
+
+@pytest.fixture
+def options(monkeypatch):
+    """Replaces the command line options of the script with the defaults the tests need"""
+    namespace = argparse.Namespace(randomize=False, include_watched=False, ignore_skipped=True, max_request_rate=None)
+    monkeypatch.setattr(generator, 'args', namespace)
+    return namespace
+
+
+class FakePlex:
+    """A playlist of (ratingKey, playlistItemID) entries, changed by the queries update_playlist sends"""
+
+    machineIdentifier = 'machine'
+
+    class Session:
+        put = 'PUT'
+        delete = 'DELETE'
+        post = 'POST'
+
+    def __init__(self, ratingKeys):
+        self._session = self.Session()
+        self.itemIDs = iter(range(1000, 100000))
+        self.entries = [(ratingKey, next(self.itemIDs)) for ratingKey in ratingKeys]
+        self.queries = list()
+
+    def fetchItems(self, key):
+        return [argparse.Namespace(ratingKey=ratingKey, playlistItemID=itemID, title=str(ratingKey))
+                for ratingKey, itemID in self.entries]
+
+    def query(self, key, method=None):
+        url = urlparse(key)
+        parts = url.path.strip('/').split('/')
+        self.queries.append((method, parts[-1] if parts[-1] in ('items', 'move') else 'delete'))
+
+        if method == 'DELETE':
+            itemID = int(parts[-1])
+            self.entries = [entry for entry in self.entries if entry[1] != itemID]
+        elif parts[-1] == 'move':
+            itemID = int(parts[-2])
+            entry = next(entry for entry in self.entries if entry[1] == itemID)
+            self.entries.remove(entry)
+            after = parse_qs(url.query).get('after')
+            position = 0 if after is None else [entry[1] for entry in self.entries].index(int(after[0])) + 1
+            self.entries.insert(position, entry)
+        else:
+            uri = parse_qs(url.query)['uri'][0]
+            for ratingKey in uri.rsplit('/', 1)[1].split(','):
+                self.entries.append((int(ratingKey), next(self.itemIDs)))
+
+
+class TestLongestIncreasingRun:
+    def test_keeps_the_longest_run_in_order(self):
+        keys = [1, 2, 3, 4, 5]
+        positions = {1: 0, 2: 3, 3: 1, 4: 2, 5: 4}
+        assert generator.longest_increasing_run(keys, positions) == {1, 3, 4, 5}
+
+    def test_reversed_keeps_one_key(self):
+        keys = [1, 2, 3]
+        positions = {1: 2, 2: 1, 3: 0}
+        assert len(generator.longest_increasing_run(keys, positions)) == 1
+
+    def test_empty(self):
+        assert generator.longest_increasing_run([], {}) == set()
+
+
+class TestUpdatePlaylist:
+    @pytest.fixture(autouse=True)
+    def playlist_uri_length(self, monkeypatch):
+        monkeypatch.setattr(generator, 'PLAYLIST_URI_MAX_LENGTH', 4000)
+
+    def update(self, current, desired):
+        plex = FakePlex(current)
+        playlist = argparse.Namespace(key='/playlists/1')
+        generator.update_playlist(plex, playlist, [movie(ratingKey) for ratingKey in desired])
+        return plex
+
+    def test_reorders_removes_and_adds(self):
+        plex = self.update([1, 2, 3, 4, 9], [4, 1, 2, 3, 5])
+        assert [ratingKey for ratingKey, _ in plex.entries] == [4, 1, 2, 3, 5]
+
+    def test_only_moves_items_out_of_order(self):
+        plex = self.update([1, 2, 3, 4, 5], [1, 2, 3, 5, 4])
+        assert [ratingKey for ratingKey, _ in plex.entries] == [1, 2, 3, 5, 4]
+        assert [query for query in plex.queries if query[1] == 'move'] == [('PUT', 'move')]
+
+    def test_unchanged_playlist_sends_nothing(self):
+        plex = self.update([1, 2, 3], [1, 2, 3])
+        assert plex.queries == []
+
+    def test_removes_duplicates(self):
+        plex = self.update([1, 1, 2], [1, 2])
+        assert [ratingKey for ratingKey, _ in plex.entries] == [1, 2]
+
+
+class TestMovieSampler:
+    def test_draws_every_movie_once(self):
+        movies = [movie(ratingKey) for ratingKey in range(50)]
+        sampler = generator.MovieSampler(movies)
+        drawn = [sampler.draw() for _ in range(50)]
+        assert sorted(item.ratingKey for item in drawn) == list(range(50))
+        assert sampler.draw() is None
+        assert sampler.remaining == 0
+
+    def test_skips_blacklisted_movies(self):
+        movies = [movie(1), movie(2, generator.BLACKLIST[0]), movie(3)]
+        sampler = generator.MovieSampler(movies)
+        drawn = [sampler.draw() for _ in range(3)]
+        assert sorted(item.ratingKey for item in drawn if item is not None) == [1, 3]
+        assert drawn[-1] is None
+
+    def test_draws_uniformly(self):
+        random.seed(1)
+        firsts = Counter(generator.MovieSampler([movie(ratingKey) for ratingKey in range(4)]).draw().ratingKey
+                         for _ in range(4000))
+        assert all(800 < count < 1200 for count in firsts.values())
+
+
+class TestShowPool:
+    def test_remove_keeps_names_and_positions_in_sync(self):
+        pool = generator.ShowPool({name: [] for name in 'abcde'})
+        for name in ['b', 'e', 'a']:
+            pool.remove(name)
+            assert all(pool.names[position] == name for name, position in pool.positions.items())
+        assert sorted(pool.names) == ['c', 'd']
+        assert len(pool) == 2
+
+    def test_choice_only_returns_remaining_shows(self):
+        pool = generator.ShowPool({'a': [], 'b': []})
+        pool.remove('a')
+        assert {pool.choice() for _ in range(10)} == {'b'}
+
+
+class TestEpisodeCursor:
+    def test_returns_episodes_in_order_skipping_specials(self, options):
+        cursor = generator.EpisodeCursor([episode(4, 2, 1), episode(1, 0, 1), episode(3, 1, 2), episode(2, 1, 1)])
+        assert len(cursor) == 3
+        assert [cursor.take().ratingKey for _ in range(3)] == [2, 3, 4]
+        assert cursor.take() is None
+
+    def test_peek_does_not_consume(self, options):
+        cursor = generator.EpisodeCursor([episode(1, 1, 1), episode(2, 1, 2)])
+        assert cursor.peek() is cursor.peek()
+        assert len(cursor) == 2
+        assert cursor.take().ratingKey == 1
+        assert len(cursor) == 1
+
+    def test_randomize_draws_every_episode_once(self, options):
+        options.randomize = True
+        cursor = generator.EpisodeCursor([episode(ratingKey, 1, ratingKey) for ratingKey in range(1, 21)])
+        drawn = [cursor.take().ratingKey for _ in range(20)]
+        assert sorted(drawn) == list(range(1, 21))
+        assert cursor.take() is None
+
+
+class TestReservoirSample:
+    def test_keeps_everything_when_short(self):
+        assert sorted(generator.reservoir_sample(iter(range(3)), 5)) == [0, 1, 2]
+
+    def test_returns_sample_size_distinct_items(self):
+        sample = generator.reservoir_sample(iter(range(100)), 10)
+        assert len(sample) == len(set(sample)) == 10
+
+    def test_samples_uniformly(self):
+        random.seed(2)
+        counts = Counter(item for _ in range(2000) for item in generator.reservoir_sample(iter(range(10)), 3))
+        assert all(450 < count < 750 for count in counts.values())
+
+
+class TestPlaylistUris:
+    def test_splits_uris_at_the_maximum_length(self, monkeypatch):
+        monkeypatch.setattr(generator, 'PLAYLIST_URI_MAX_LENGTH', 120)
+        plex = FakePlex([])
+        items = [movie(ratingKey) for ratingKey in range(10000, 10100)]
+        uris = list(generator.playlist_uris(plex, items))
+
+        assert len(uris) > 1
+        assert all(len(uri) <= 120 for uri in uris)
+        assert [int(ratingKey) for uri in uris for ratingKey in uri.rsplit('/', 1)[1].split(',')] == list(range(10000, 10100))
+
+    def test_no_items_no_uris(self):
+        assert list(generator.playlist_uris(FakePlex([]), [])) == []
+
+
+class TestRateLimiter:
+    @pytest.fixture
+    def sleeps(self, monkeypatch):
+        sleeps = list()
+        monkeypatch.setattr(generator.time, 'sleep', sleeps.append)
+        return sleeps
+
+    def test_unlimited_host_never_waits(self, sleeps):
+        limiter = generator.RateLimiter(None)
+        for _ in range(100):
+            limiter.acquire()
+        assert sleeps == []
+
+    def test_limited_host_waits_after_the_burst(self, sleeps):
+        limiter = generator.RateLimiter(2)
+        for _ in range(4):
+            limiter.acquire()
+        assert len(sleeps) == 2
+
+    def test_backoff_limits_an_unlimited_host_until_it_recovers(self, sleeps):
+        limiter = generator.RateLimiter(None)
+        limiter.backoff(3)
+        assert limiter.rate == generator.RATE_LIMIT_BACKOFF_RATE
+        limiter.acquire()
+        assert sleeps and sleeps[0] > 2
+
+        while limiter.rate is not None:
+            limiter.recover()
+        assert limiter.max_rate is None
+
+    def test_backoff_halves_the_rate_and_recover_stops_at_the_maximum(self):
+        limiter = generator.RateLimiter(8)
+        limiter.backoff(0)
+        assert limiter.rate == 4
+        for _ in range(100):
+            limiter.recover()
+        assert limiter.rate == 8
+
+
+class TestRateLimitedSession:
+    @pytest.fixture
+    def responses(self, monkeypatch, options):
+        """Answers every request with the next status code of the list"""
+        statuses = list()
+        sent = list()
+
+        def request(session, method, url, *args, **kwargs):
+            sent.append(method)
+            status = statuses.pop(0) if statuses else 200
+            return argparse.Namespace(status_code=status, ok=status < 400, headers={'Retry-After': '0'})
+
+        monkeypatch.setattr(generator.requests.Session, 'request', request)
+        monkeypatch.setattr(generator, 'rate_limiters', dict())
+        monkeypatch.setattr(generator.time, 'sleep', lambda seconds: None)
+        return statuses, sent
+
+    def test_retries_a_get_that_was_pushed_back(self, responses):
+        statuses, sent = responses
+        statuses.extend([429, 503])
+        assert generator.RateLimitedSession().request('GET', 'http://plex/a').status_code == 200
+        assert sent == ['GET', 'GET', 'GET']
+
+    def test_does_not_retry_a_post(self, responses):
+        statuses, sent = responses
+        statuses.append(429)
+        assert generator.RateLimitedSession().request('POST', 'http://plex/playlists').status_code == 429
+        assert sent == ['POST']
+
+    def test_reuses_a_get_response_until_a_write(self, responses):
+        _, sent = responses
+        session = generator.RateLimitedSession()
+        session.request('GET', 'http://plex/a')
+        session.request('GET', 'http://plex/a')
+        assert sent == ['GET']
+        session.request('PUT', 'http://plex/b')
+        session.request('GET', 'http://plex/a')
+        assert sent == ['GET', 'PUT', 'GET']
+
+
+class TestSampleSectionMovies:
+    @pytest.fixture
+    def sections(self, monkeypatch, options):
+        """Movie sections whose random sort query returns a random sample of their movies"""
+        options.async_engine = False
+        monkeypatch.setattr(generator, 'element_records', lambda data, libtype: data)
+        monkeypatch.setattr(generator, 'query_section_items',
+                            lambda section, container_size, sort=None: random.sample(section.movies, min(container_size, len(section.movies))))
+        monkeypatch.setattr(generator, 'iter_section_items', lambda section, libtype, unwatched=False: iter(section.movies))
+
+        def sections(*movieLists):
+            return [argparse.Namespace(key=str(key), title=f'Movies {key}', movies=movies) for key, movies in enumerate(movieLists)]
+        return sections
+
+    def test_split_draws_never_exceeds_a_count(self):
+        random.seed(3)
+        for _ in range(200):
+            shares = generator.split_draws([2, 0, 5, 100], 12)
+            assert sum(shares) == 12
+            assert shares[0] <= 2 and shares[1] == 0 and shares[2] <= 5
+        assert generator.split_draws([1, 2], 10) == [1, 2]
+
+    def test_small_section_shortfall_goes_to_the_other_sections(self, sections):
+        random.seed(4)
+        small, large = [movie(1), movie(2)], [movie(ratingKey) for ratingKey in range(100, 200)]
+        for _ in range(100):
+            movies = generator.sample_section_movies(sections(small, large), [2, 100], 10)
+            assert len({item.ratingKey for item in movies}) == len(movies) >= 10
+
+    def test_blacklisted_section_shortfall_goes_to_the_other_sections(self, sections):
+        random.seed(5)
+        blacklisted = [movie(ratingKey, generator.BLACKLIST[0]) for ratingKey in range(1, 51)]
+        eligible = [movie(ratingKey) for ratingKey in range(100, 112)]
+        for _ in range(100):
+            movies = generator.sample_section_movies(sections(blacklisted, eligible), [50, 12], 10)
+            assert len({item.ratingKey for item in movies}) == len(movies) >= 10
+            assert all(item.title not in generator.BLACKLIST for item in movies)
+
+    def test_returns_every_movie_when_too_few(self, sections):
+        movies = generator.sample_section_movies(sections([movie(1)], [movie(2), movie(3)]), [1, 2], 10)
+        assert sorted(item.ratingKey for item in movies) == [1, 2, 3]
+
+
+class TestLoadJobs:
+    @pytest.fixture
+    def load(self, tmp_path):
+        """Writes the jobs to a jobs file and loads them with the options of the command line"""
+        def load(jobs, argv=('--server', '--token', 'token')):
+            path = tmp_path / 'jobs.json'
+            path.write_text(json.dumps(jobs))
+            options = generator.get_parser().parse_args(['--jobs', str(path)] + list(argv))
+            return generator.load_jobs(str(path), options)
+        return load
+
+    def test_options_are_parsed_like_the_command_line(self, load):
+        job, = load([{'name': 'Kids', 'number': '20', 'select-library': ['Kids TV', 'Anime'],
+                      'check-skipped': True, 'async': True}])
+        assert job.name == 'Kids'
+        assert job.number == 20
+        assert job.select_library == 'Kids TV,Anime'
+        assert job.ignore_skipped is False
+        assert job.async_engine is True
+        assert job.token == 'token'
+
+    def test_jobs_share_the_snapshot_unless_they_opt_out(self, load):
+        shared, own = load([{'name': 'Shared'}, {'name': 'Own', 'shared-snapshot': False}])
+        assert shared.shared_snapshot is True
+        assert own.shared_snapshot is False
+
+    def test_false_resets_a_command_line_flag(self, load):
+        job, = load([{'debug': False}], argv=['--debug'])
+        assert job.debug is False
+
+    def test_jobs_do_not_change_each_other(self, load):
+        first, second = load([{'number': 5}, {'name': 'Second'}])
+        assert (first.number, second.number) == (5, 10)
+
+    @pytest.mark.parametrize('job, code', [({'unknown': 1}, 1), ({'jobs': 'other.json'}, 1), ({'debug': 'yes'}, 1),
+                                           ({'number': 'many'}, 2)])
+    def test_invalid_jobs_exit(self, load, job, code, capsys):
+        with pytest.raises(SystemExit) as exit_info:
+            load([job])
+        assert exit_info.value.code == code
+
+
+class TestRandomSortRequests:
+    def test_responses_are_not_reused(self, monkeypatch, options):
+        sent = list()
+
+        def request(session, method, url, *args, **kwargs):
+            sent.append(url)
+            return argparse.Namespace(status_code=200, ok=True, headers={})
+
+        monkeypatch.setattr(generator.requests.Session, 'request', request)
+        session = generator.RateLimitedSession()
+        for url in ['http://plex/library/sections/1/all?sort=random&unwatched=1'] * 2 + ['http://plex/library/sections/1/all'] * 2:
+            session.request('GET', url)
+        assert len(sent) == 3
+        assert generator.is_random_request('http://plex/a', {'params': {'sort': 'random:desc'}})
+        assert not generator.is_random_request('http://plex/a?sort=titleSort', {})
+
+
+class TestSnapshotCandidates:
+    @pytest.fixture
+    def snapshot(self, monkeypatch, options):
+        """A snapshot of one movie section with three movies, of which the user watched movie 2"""
+        section = argparse.Namespace(type=generator.MOVIE_SECTION_TYPE, title='Movies', key='1')
+        catalog = argparse.Namespace(section=lambda title: section)
+        monkeypatch.setattr(generator, 'get_section_catalog', lambda plex: catalog)
+        monkeypatch.setattr(generator, 'get_watched_keys', lambda section, libtype: {2})
+        monkeypatch.setattr(generator, 'get_visible_keys', lambda section, libtype: {1, 2})
+        monkeypatch.setattr(generator, 'restricted_connections', set())
+
+        snapshot = generator.LibrarySnapshot(argparse.Namespace(_baseurl='http://plex', _token='admin'))
+        snapshot.sections['Movies'] = ([movie(1), movie(2), movie(3)], dict())
+        return snapshot
+
+    def candidates(self, snapshot, token):
+        _, _, movies, _, _ = snapshot.get_candidates(argparse.Namespace(_baseurl='http://plex', _token=token), ['Movies'])
+        return sorted(item.ratingKey for item in movies)
+
+    def test_unrestricted_user_gets_every_unwatched_movie(self, snapshot):
+        assert self.candidates(snapshot, 'user') == [1, 3]
+
+    def test_restricted_user_only_gets_visible_movies(self, snapshot):
+        generator.restricted_connections.add(('http://plex', 'user'))
+        assert self.candidates(snapshot, 'user') == [1]
+
+    @pytest.mark.parametrize('attributes, restricted', [
+        (dict(restricted='0', filterAll='', filterMovies='', filterTelevision=''), False),
+        (dict(restricted='1', filterAll='', filterMovies='', filterTelevision=''), True),
+        (dict(restricted='0', filterAll='', filterMovies='label=kids', filterTelevision=''), True),
+        (dict(restricted=None, filterAll=None, filterMovies=None, filterTelevision='contentRating=G'), True)])
+    def test_restricted_users(self, attributes, restricted):
+        assert generator.is_restricted_user(argparse.Namespace(**attributes)) is restricted
+        assert generator.is_restricted_user(None) is True
+
+
+class TestMetadataCacheSync:
+    class FakeServer:
+        """A movie section whose listing honours the type, updatedAt>>= filter and container headers"""
+
+        machineIdentifier = 'machine'
+
+        def __init__(self):
+            self.movies = dict()
+            self.keys = list()
+
+        def add(self, ratingKey, updatedAt=None, addedAt=100):
+            attributes = {'ratingKey': str(ratingKey), 'type': 'movie', 'title': f'Movie {ratingKey}', 'addedAt': str(addedAt)}
+            if updatedAt is not None:
+                attributes['updatedAt'] = str(updatedAt)
+            self.movies[ratingKey] = attributes
+
+        def query(self, key, headers=None):
+            self.keys.append(key)
+            since = parse_qs(urlparse(key).query).get('updatedAt>>')
+            since = int(since[0]) if since else None
+            matching = [attributes for attributes in self.movies.values()
+                        if since is None or int(attributes.get('updatedAt', attributes['addedAt'])) >= since]
+            start, size = int(headers['X-Plex-Container-Start']), int(headers['X-Plex-Container-Size'])
+            data = ElementTree.Element('MediaContainer', totalSize=str(len(matching)))
+            for attributes in matching[start:start + size]:
+                ElementTree.SubElement(data, 'Video', attributes)
+            return data
+
+    @pytest.fixture
+    def cache(self, tmp_path, options):
+        options.refresh_cache = False
+        options.cache_max_age = 86400
+        return generator.MetadataCache(str(tmp_path))
+
+    def section(self, updatedAt):
+        return argparse.Namespace(key=1, title='Movies', type=generator.MOVIE_SECTION_TYPE,
+                                  updatedAt=datetime.datetime.fromtimestamp(updatedAt))
+
+    def cached(self, cache, server, updatedAt):
+        items, _ = cache.section(server, self.section(updatedAt))
+        return sorted(item.ratingKey for item in items)
+
+    def test_first_sync_is_full_then_incremental(self, cache):
+        server = self.FakeServer()
+        for ratingKey in (1, 2, 3):
+            server.add(ratingKey, updatedAt=200)
+        assert self.cached(cache, server, 1000) == [1, 2, 3]
+        assert all('updatedAt' not in key for key in server.keys)
+
+        server.keys.clear()
+        server.add(4, updatedAt=300)
+        assert self.cached(cache, server, 1000) == [1, 2, 3, 4]
+        assert len(server.keys) == 1 and 'updatedAt>>=200' in server.keys[0]
+
+    def test_deleted_items_are_dropped_when_the_section_changed(self, cache):
+        server = self.FakeServer()
+        for ratingKey in (1, 2, 3):
+            server.add(ratingKey, updatedAt=200)
+        self.cached(cache, server, 1000)
+
+        #One movie deleted and one added keep the count the same
+        del server.movies[2]
+        server.add(5, updatedAt=300)
+        assert self.cached(cache, server, 2000) == [1, 3, 5]
+
+    def test_items_without_updated_at_sync_incrementally(self, cache):
+        server = self.FakeServer()
+        server.add(1, addedAt=150)
+        server.add(2, updatedAt=120, addedAt=100)
+        self.cached(cache, server, 1000)
+
+        server.keys.clear()
+        self.cached(cache, server, 1000)
+        assert len(server.keys) == 1 and 'updatedAt>>=150' in server.keys[0]
+
+    def test_refresh_cache_resyncs_everything(self, cache, options):
+        server = self.FakeServer()
+        server.add(1, updatedAt=200)
+        self.cached(cache, server, 1000)
+        del server.movies[1]
+        server.add(2, updatedAt=100)
+
+        options.refresh_cache = True
+        assert self.cached(cache, server, 1000) == [2]
+
+
+class TestRunOptions:
+    @pytest.fixture
+    def run_options(self):
+        run_options = generator.RunOptions()
+        run_options.use_options(argparse.Namespace(randomize=False, async_concurrency=2))
+        return run_options
+
+    def test_copy_changes_stay_in_the_worker(self, run_options):
+        def worker(randomize):
+            token = run_options.begin_copy()
+            try:
+                run_options.randomize = randomize
+                barrier.wait()
+                return run_options.randomize
+            finally:
+                run_options.end_copy(token)
+
+        barrier = threading.Barrier(4)
+        with ThreadPoolExecutor(4) as executor:
+            assert list(executor.map(worker, range(4))) == [0, 1, 2, 3]
+        assert run_options.randomize is False
+
+    def test_copy_is_visible_to_async_calls(self, run_options, monkeypatch):
+        monkeypatch.setattr(generator, 'args', run_options)
+        token = run_options.begin_copy()
+        try:
+            run_options.randomize = True
+            assert generator.run_concurrently([lambda: run_options.randomize] * 3) == [True] * 3
+        finally:
+            run_options.end_copy(token)
+        assert run_options.randomize is False
+
+
+class TestSkippedMissing:
+    @pytest.fixture
+    def show(self, monkeypatch):
+        season_counts = {(1, 1): 10}
+        monkeypatch.setattr(generator, 'tvdb_season_count', lambda show, season: season_counts.get((show.ratingKey, season)))
+        return argparse.Namespace(ratingKey=1, title='Show')
+
+    def present(self, *episodes):
+        return generator.index_episodes([episode(ratingKey, season, index) for ratingKey, (season, index) in enumerate(episodes)])
+
+    def test_previous_episode_of_the_season_present(self, show):
+        assert generator.skipped_missing(show, episode(1, 1, 3), self.present((1, 1), (1, 2), (1, 3))) is False
+
+    def test_previous_episode_of_the_season_missing(self, show):
+        assert generator.skipped_missing(show, episode(1, 1, 3), self.present((1, 1), (1, 3))) is True
+
+    def test_last_episode_of_the_previous_season(self, show):
+        assert generator.skipped_missing(show, episode(1, 2, 1), self.present((1, 10), (2, 1))) is False
+        assert generator.skipped_missing(show, episode(1, 2, 1), self.present((1, 9), (2, 1))) is True
+
+    def test_unknown_previous_season_is_not_skipped(self, show):
+        assert generator.skipped_missing(show, episode(1, 3, 1), self.present((3, 1))) is False
+
+    def test_first_episode_is_never_skipped(self, show):
+        assert generator.skipped_missing(show, episode(1, 1, 1), set()) is False
+
+
+class TestPlaylistIndex:
+    class Playlist:
+        def __init__(self, title, fail=False):
+            self.title = title
+            self.fail = fail
+            self.deletes = 0
+
+        def delete(self):
+            time.sleep(0.01)
+            self.deletes += 1
+            if self.fail:
+                raise generator.BadRequest('delete failed')
+
+    def index(self, *playlists):
+        return generator.PlaylistIndex(argparse.Namespace(playlists=lambda: list(playlists)))
+
+    def test_titles_match_case_insensitively(self):
+        playlist = self.Playlist('Kids Shows')
+        assert self.index(playlist).playlist('kids shows') is playlist
+        with pytest.raises(generator.NotFound):
+            self.index(playlist).playlist('Movies')
+
+    def test_delete_removes_the_first_playlist_of_the_title(self):
+        first, second = self.Playlist('A'), self.Playlist('a')
+        index = self.index(first, second)
+        index.delete('A')
+        assert first.deletes == 1
+        assert index.playlist('A') is second
+
+    def test_concurrent_deletes_delete_once(self):
+        playlist = self.Playlist('A')
+        index = self.index(playlist)
+        results = list()
+
+        def delete():
+            try:
+                index.delete('A')
+                results.append('deleted')
+            except generator.NotFound:
+                results.append('not found')
+
+        threads = [threading.Thread(target=delete) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(results) == ['deleted', 'not found', 'not found', 'not found']
+        assert playlist.deletes == 1
+
+    def test_failed_delete_keeps_the_playlist(self):
+        playlist = self.Playlist('A', fail=True)
+        index = self.index(playlist)
+        with pytest.raises(generator.BadRequest):
+            index.delete('A')
+        assert index.playlist('A') is playlist
+
+    def test_added_playlists_are_found(self):
+        index = self.index()
+        playlist = self.Playlist('New')
+        index.add(playlist)
+        assert index.playlist('new') is playlist
+
+
+class TestTvdbSeasonCache:
+    class Series(dict):
+        def __missing__(self, season):
+            raise generator.tvdb_api.tvdb_seasonnotfound(f'Season {season} not found')
+
+    @pytest.fixture
+    def tvdb(self, monkeypatch, options, tmp_path):
+        """A TVDB client that knows seasons 1 and 2 of series 100 and counts its lookups"""
+        options.tvdb_api_key = 'key'
+        options.tvdb_cache_ttl = 3600
+        options.cache_dir = str(tmp_path)
+        lookups = list()
+
+        class Client:
+            def __getitem__(client, tvdb_id):
+                lookups.append(tvdb_id)
+                return self.Series({1: [None] * 10, 2: [None] * 8})
+
+        monkeypatch.setattr(generator, 'tvdb_client', Client())
+        monkeypatch.setattr(generator, 'tvdb_season_cache', None)
+        return lookups
+
+    show = argparse.Namespace(title='Show', guid='com.plexapp.agents.thetvdb://100?lang=en')
+
+    def test_every_season_of_the_series_is_cached(self, tvdb):
+        assert generator.tvdb_season_count(self.show, 1) == 10
+        assert generator.tvdb_season_count(self.show, 2) == 8
+        assert tvdb == [100]
+
+    def test_unknown_seasons_are_cached_as_none(self, tvdb):
+        assert generator.tvdb_season_count(self.show, 5) is None
+        assert generator.tvdb_season_count(self.show, 5) is None
+        assert tvdb == [100]
+
+    def test_unknown_seasons_are_kept_on_disk(self, tvdb, options):
+        generator.tvdb_season_count(self.show, 5)
+        assert generator.TvdbSeasonCache(options.cache_dir).get(100, 5) == (True, None)
+        assert generator.TvdbSeasonCache(options.cache_dir).get(100, 1) == (True, 10)
+
+    def test_expired_counts_are_looked_up_again(self, tvdb, options):
+        generator.tvdb_season_count(self.show, 5)
+        options.tvdb_cache_ttl = -1
+        assert generator.get_tvdb_season_cache().get(100, 5) == (False, None)
+        generator.tvdb_season_count(self.show, 5)
+        assert tvdb == [100, 100]
+
+
+class TestGetUserTokens:
+    @pytest.fixture
+    def listings(self, monkeypatch):
+        """plex.tv listings by path, parsed like fetch_plex_api does"""
+        listings = dict()
+        fetches = list()
+
+        def fetch_plex_api(path, plextv=False, token=None):
+            fetches.append(path)
+            return xmltodict.parse(listings[path])
+
+        monkeypatch.setattr(generator, 'fetch_plex_api', fetch_plex_api)
+        monkeypatch.setattr(generator, 'plextv_listings', dict())
+        listings['fetches'] = fetches
+        return listings
+
+    def test_users_are_named_by_title(self, listings):
+        listings['/api/users'] = ('<MediaContainer><User id="1" title="Kids" username=""/>'
+                                  '<User id="2" title="Friend Name" username="friend"/>'
+                                  '<User id="3" title="" username="other"/></MediaContainer>')
+        listings['/api/servers/abc/shared_servers'] = ('<MediaContainer><SharedServer userID="1" accessToken="kids-token"/>'
+                                                       '<SharedServer userID="2" accessToken="friend-token"/>'
+                                                       '<SharedServer userID="3" accessToken="other-token"/>'
+                                                       '<SharedServer userID="9" accessToken="unknown-token"/></MediaContainer>')
+        assert generator.get_user_tokens('abc') == {'Kids': 'kids-token', 'Friend Name': 'friend-token', 'other': 'other-token'}
+
+    def test_lone_elements(self, listings):
+        listings['/api/users'] = '<MediaContainer><User id="1" title="Kids" username=""/></MediaContainer>'
+        listings['/api/servers/abc/shared_servers'] = '<MediaContainer><SharedServer userID="1" accessToken="kids-token"/></MediaContainer>'
+        assert generator.get_user_tokens('abc') == {'Kids': 'kids-token'}
+
+    def test_empty_listings(self, listings):
+        listings['/api/users'] = '<MediaContainer size="0"/>'
+        listings['/api/servers/abc/shared_servers'] = '<MediaContainer/>'
+        assert generator.get_user_tokens('abc') == {}
+
+    def test_listings_are_fetched_once(self, listings):
+        listings['/api/users'] = '<MediaContainer><User id="1" title="Kids"/></MediaContainer>'
+        listings['/api/servers/abc/shared_servers'] = '<MediaContainer><SharedServer userID="1" accessToken="kids-token"/></MediaContainer>'
+        generator.get_user_tokens('abc')
+        generator.get_user_tokens('abc')
+        assert listings['fetches'] == ['/api/users', '/api/servers/abc/shared_servers']
+
+
+class TestHomeUserTokenCache:
+    key = ('machine', 'account', 'Kids')
+
+    @pytest.fixture
+    def cache_dir(self, options, tmp_path):
+        options.home_token_ttl = 3600
+        return str(tmp_path)
+
+    def test_tokens_are_kept_on_disk_for_the_owner_only(self, cache_dir):
+        generator.HomeUserTokenCache(cache_dir).set(self.key, 'token')
+        assert generator.HomeUserTokenCache(cache_dir).get(self.key) == 'token'
+        assert stat.S_IMODE(os.stat(os.path.join(cache_dir, 'home_user_tokens.sqlite')).st_mode) == 0o600
+
+    def test_existing_file_is_made_owner_only(self, cache_dir):
+        path = os.path.join(cache_dir, 'home_user_tokens.sqlite')
+        open(path, 'w').close()
+        os.chmod(path, 0o644)
+        generator.HomeUserTokenCache(cache_dir)
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    def test_expired_tokens_are_not_returned(self, cache_dir, options):
+        cache = generator.HomeUserTokenCache(cache_dir)
+        cache.set(self.key, 'token')
+        options.home_token_ttl = -1
+        cache.set(('machine', 'account', 'Other'), 'other')
+        assert cache.get(('machine', 'account', 'Other')) is None
+        assert cache.get(self.key) == 'token'
+
+    def test_none_forgets_the_token(self, cache_dir):
+        generator.HomeUserTokenCache(cache_dir).set(self.key, 'token')
+        generator.HomeUserTokenCache(cache_dir).set(self.key, None)
+        assert generator.HomeUserTokenCache(cache_dir).get(self.key) is None
+
+    def test_zero_ttl_never_writes_to_disk(self, cache_dir, options):
+        options.home_token_ttl = 0
+        generator.HomeUserTokenCache(cache_dir).set(self.key, 'token')
+        options.home_token_ttl = 3600
+        assert generator.HomeUserTokenCache(cache_dir).tokens == {}
+
+    def test_memory_only_without_cache_dir(self, options):
+        options.home_token_ttl = 3600
+        cache = generator.HomeUserTokenCache()
+        cache.set(self.key, 'token')
+        assert cache.get(self.key) == 'token'